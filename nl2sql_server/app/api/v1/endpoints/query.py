@@ -1,88 +1,478 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from models.schemas import QueryRequest, QueryResponse
 from llm.sql_generator import generate_sql
-from db.schema_extractor.session import get_db
-from db.schema_extractor.schema_extractor import extract_schema
-from db.sql_executor.sql_executor import execute_query
+from llm.schema_pruner import build_schema_context
+from db.schema_extractor.session import get_db, run_db
+from db.schema_extractor.schema_snapshot import get_schema, get_schema_tables, get_schema_fingerprint
+from db.sql_executor.sql_executor import execute_query, stream_query
 from services.validator import validate_sql
-from utils.formatter import format_results
-from utils.optimizer import optimize_question
-from utils.cache import get_cache, set_cache, make_hash_key
+from services.sql_tables import extract_tables
+from services.sql_templates import match_template, learn_template
+from services.pagination import first_page, next_page
+from services.cost_guard import check_query_cost
+from utils.formatter import format_results, ndjson_chunks, csv_chunks, OUTPUT_FORMATS
+from utils.arrow_export import encode_results
+from utils.optimizer import optimize_question, canonicalize_question
+from utils.cache import (
+    get_cache, set_cache, get_swr_cache, set_swr_cache, get_swr_bytes_cache, set_swr_bytes_cache,
+    make_hash_key, tag_cache_key, invalidate_tables
+)
+from utils.singleflight import llm_flight, result_flight
+from utils.semantic_cache import semantic_cache
 from core.config import settings
-from loguru import logger  
-import json  
+from loguru import logger
+from contextlib import ExitStack
+from urllib.parse import quote
+import asyncio
+import json
+import string
 
 router = APIRouter()
 
+# Strong references so pending background refreshes aren't garbage collected
+refresh_tasks = set()
+
+async def generate_llm_result(optimized_question: str, schema_info, cache_key_llm: str):
+    fingerprint = get_schema_fingerprint()
+    # The semantic cache hashes, locks and touches SQLite, so it stays off the event loop
+    loop = asyncio.get_running_loop()
+    if settings.SEMANTIC_CACHE_ENABLED:
+        match = await loop.run_in_executor(None, semantic_cache.lookup, optimized_question, fingerprint)
+        if match:
+            logger.info(f"Near-duplicate question found ({match['similarity']:.2f}): {match['question']}")
+            llm_result = {"sql": match["sql"], "token_usage": {}}
+            set_cache(cache_key_llm, llm_result, expire=600)
+            return llm_result
+
+    logger.info(f"Generating SQL for question: {optimized_question}")
+    schema_context, schema_usage = build_schema_context(
+        optimized_question, get_schema_tables(), schema_info
+    )
+    llm_result = await generate_sql(
+        optimized_question,
+        schema_context,
+        settings.OPENAI_API_KEY,
+        return_usage=True
+    )
+    if "token_usage" in llm_result:
+        llm_result["token_usage"].update(schema_usage)
+    set_cache(cache_key_llm, llm_result, expire=600)
+    if settings.SEMANTIC_CACHE_ENABLED and "sql" in llm_result:
+        await loop.run_in_executor(None, semantic_cache.add, optimized_question, llm_result["sql"], fingerprint)
+    return llm_result
+
+def load_schema():
+    with get_db(read_only=True) as db:
+        logger.info("DB connection established successfully.")
+        # Served from the snapshot unless the catalog changed
+        return get_schema(db)
+
+def run_select(sql_query: str, cache_key_result: str, params: dict = None, read_only: bool = True, formats=OUTPUT_FORMATS):
+    # Runs once per in-flight SQL, so it owns its session instead of borrowing the caller's
+    with get_db(read_only=read_only) as db:
+        logger.info("Executing the SQL query.")
+        rows, columns = execute_query(db, sql_query, params)
+        logger.info(f"Query executed successfully, fetched {len(rows)} rows.")
+    formatted_results = format_results(rows, columns, formats)
+    # Fresh for RESULT_CACHE_SOFT_TTL, then served stale until a write to one of its
+    # tables invalidates it or RESULT_CACHE_TTL passes
+    set_swr_cache(
+        cache_key_result,
+        formatted_results,
+        fresh_for=settings.RESULT_CACHE_SOFT_TTL,
+        expire=settings.RESULT_CACHE_TTL
+    )
+    tag_cache_key(cache_key_result, extract_tables(sql_query))
+    return formatted_results
+
+def run_modification(sql_query: str, formats=OUTPUT_FORMATS):
+    with get_db() as db:
+        logger.info("Executing non-SELECT SQL query.")
+        rows, columns = execute_query(db, sql_query)
+        db.commit()
+        logger.info(f"Query executed successfully, fetched {len(rows)} rows.")
+    invalidated = invalidate_tables(extract_tables(sql_query))
+    logger.info(f"Invalidated {invalidated} cached results.")
+    return format_results(rows, columns, formats)
+
+def run_export(sql_query: str, cache_key_export: str, format: str, params: dict = None, read_only: bool = True):
+    with get_db(read_only=read_only) as db:
+        logger.info(f"Executing the SQL query for a {format} export.")
+        rows, columns = execute_query(db, sql_query, params)
+        logger.info(f"Query executed successfully, fetched {len(rows)} rows.")
+    payload = encode_results(rows, columns, format, {"sql_query": sql_query})
+    # Same freshness rules as /query results, so an export is never older than the same SQL there
+    set_swr_bytes_cache(
+        cache_key_export,
+        payload,
+        fresh_for=settings.RESULT_CACHE_SOFT_TTL,
+        expire=settings.RESULT_CACHE_TTL
+    )
+    tag_cache_key(cache_key_export, extract_tables(sql_query))
+    return payload
+
+def open_stream(sql_query: str, params: dict = None, read_only: bool = True):
+    """Execute on a server-side cursor, returning (columns, batches, session stack to close)."""
+    stack = ExitStack()
+    db = stack.enter_context(get_db(read_only=read_only))
+    try:
+        columns, batches = stream_query(db, sql_query, params)
+    except Exception:
+        stack.close()
+        raise
+    return columns, batches, stack
+
+async def iterate_in_db_pool(chunks, stack: ExitStack):
+    # Each chunk may fetch the next batch from the cursor, so pull it on the DB thread pool
+    try:
+        while True:
+            chunk = await run_db(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # Also runs when the client disconnects mid-stream
+        await run_db(chunks.close)
+        await run_db(stack.close)
+
+def run_cost_guard(sql_query: str, params: dict = None, read_only: bool = False, allow_limit: bool = True):
+    # Explained where it will run, replicas can have different statistics
+    with get_db(read_only=read_only) as db:
+        return check_query_cost(db, sql_query, params, allow_limit)
+
+def run_first_page(sql_query: str, params: dict, page_size: int, read_only: bool = True):
+    with get_db(read_only=read_only) as db:
+        logger.info(f"Executing the SQL query for its first page of {page_size} rows.")
+        return first_page(db, sql_query, params, page_size, get_schema_tables())
+
+def run_next_page(cursor: str):
+    # Cursors only ever page through SELECTs
+    with get_db(read_only=True) as db:
+        logger.info("Fetching the next page of a paginated query.")
+        return next_page(db, cursor)
+
+async def execute_select(
+    sql_query: str, cache_key_result: str, params: dict = None, read_only: bool = True, formats=OUTPUT_FORMATS
+):
+    # Blocking driver calls run in the DB thread pool so a slow query doesn't stall the event loop
+    return await run_db(run_select, sql_query, cache_key_result, params, read_only, formats)
+
+def schedule_refresh(
+    sql_query: str, cache_key_result: str, params: dict = None, read_only: bool = True, formats=OUTPUT_FORMATS
+):
+    refresh_in_background(
+        cache_key_result, lambda: execute_select(sql_query, cache_key_result, params, read_only, formats)
+    )
+
+def refresh_in_background(cache_key: str, fn):
+    """Re-run `fn` (which re-caches its result) in the background, sharing the flight of `cache_key`."""
+    async def refresh():
+        try:
+            await result_flight.do(cache_key, fn)
+            logger.info("Stale query result refreshed in the background.")
+        except Exception as e:
+            logger.error(f"Background refresh of stale query result failed: {str(e)}")
+
+    task = asyncio.create_task(refresh())
+    refresh_tasks.add(task)
+    task.add_done_callback(refresh_tasks.discard)
+
+async def resolve_sql(request: QueryRequest, allow_limit: bool = True) -> dict:
+    """
+    Turn the request's question into validated SQL.
+    - Returns {"sql_query", "generated_sql", "plan", "read_only", "params", "token_usage",
+      "canonical_question", "fingerprint", "generated"}; "sql_query" is what to run after the cost guard
+    - `generated` is False when the SQL came from the LLM cache or a learned template
+    - With `allow_limit` False the cost guard rejects expensive SELECTs instead of adding a LIMIT
+    """
+    # Extract schema
+    schema_info = await run_db(load_schema)
+    schema_str = json.dumps(schema_info, sort_keys=True)
+    logger.info(f"Schema info extracted: {schema_info}")
+
+    # Optimize question
+    optimized_question = optimize_question(request.question)
+    logger.info(f"Optimized question: {optimized_question}")
+
+    #  Check LLM cache, concurrent misses for the same key share one LLM call.
+    #  The key uses the canonical form so rewordings hit, the model still gets the original text.
+    canonical_question = canonicalize_question(optimized_question)
+    cache_key_llm = make_hash_key(canonical_question + schema_str)
+    cached_llm = get_cache(cache_key_llm)
+    fingerprint = get_schema_fingerprint()
+    template = None
+    if not cached_llm and settings.SQL_TEMPLATES_ENABLED:
+        template = match_template(canonical_question, fingerprint)
+
+    params = None
+    if cached_llm:
+        logger.info("LLM result found in cache.")
+        llm_result = cached_llm
+    elif template:
+        #  Same question shape with different literals, bind them instead of asking the LLM
+        logger.info("Question matched a learned SQL template.")
+        llm_result = {"sql": template[0], "token_usage": {}}
+        params = template[1]
+    else:
+        llm_result = await llm_flight.do(
+            cache_key_llm,
+            lambda: generate_llm_result(optimized_question, schema_info, cache_key_llm)
+        )
+
+    sql_query = llm_result["sql"].replace('```sql', '').replace('```', '').strip()
+    token_usage = llm_result.get("token_usage", {})
+    logger.info(f"Generated SQL: {sql_query}")
+    if params:
+        logger.info(f"Bound parameters: {params}")
+    logger.info(f"Token usage: {token_usage}")
+
+    # Validate SQL
+    logger.info("Validating the SQL query.")
+    is_valid = validate_sql(sql_query, allow_modifications=request.allow_modifications)
+    if not is_valid:
+        logger.error("Generated SQL is not safe to execute.")
+        raise ValueError("Generated SQL is not safe to execute.")
+
+    #  Read-only SELECTs go to a replica when there are any, anything the request allows
+    #  to modify data stays on the primary
+    read_only = is_select(sql_query) and not request.allow_modifications
+
+    #  Planner estimate before running it, expensive SELECTs may come back with a LIMIT
+    plan = None
+    generated_sql = sql_query
+    if settings.COST_GUARD_ENABLED:
+        sql_query, plan = await run_db(run_cost_guard, sql_query, params, read_only, allow_limit)
+        if plan and plan["action"] == "limited":
+            logger.info(f"Cost guard downgraded the SQL to: {sql_query}")
+
+    return {
+        "sql_query": sql_query,
+        "generated_sql": generated_sql,
+        "plan": plan,
+        "read_only": read_only,
+        "params": params,
+        "token_usage": token_usage,
+        "canonical_question": canonical_question,
+        "fingerprint": fingerprint,
+        "generated": not cached_llm and not template,
+    }
+
+def result_cache_key(sql_query: str, params: dict = None, variant: str = "") -> str:
+    # Representations of the same result (formats, export encodings) are cached apart
+    source = sql_query + json.dumps(params, sort_keys=True) if params else sql_query
+    return make_hash_key(source + variant)
+
+def result_fields(formatted_results: dict) -> dict:
+    # QueryResponse fields for whichever formats were built, the others stay None
+    return {
+        "table": formatted_results.get("table"),
+        "results": formatted_results.get("json"),
+        "columns": formatted_results.get("columns"),
+        "data": formatted_results.get("data"),
+    }
+
+def is_select(sql_query: str) -> bool:
+    return sql_query.lower().strip().startswith("select")
+
+def remember_template(resolved: dict):
+    # Only SQL that just came from the LLM and ran successfully is worth a template
+    if resolved["generated"] and settings.SQL_TEMPLATES_ENABLED:
+        if learn_template(resolved["canonical_question"], resolved["generated_sql"], resolved["fingerprint"]):
+            logger.info("Learned a SQL template from this question.")
+
+async def cancel_on_disconnect(http_request: Request, coro):
+    """
+    Await `coro`, cancelling it if the client goes away first.
+    - Cancellation reaches the pending LLM call (once no other request shares it) and the
+      running statement, whose pool connection is released right away
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=settings.DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logger.info("Client disconnected, cancelling the request.")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        if not task.done():
+            task.cancel()
+
 @router.post("/query", response_model=QueryResponse)
-async def generate_and_execute_query(request: QueryRequest):
+async def generate_and_execute_query(request: QueryRequest, http_request: Request):
+    return await cancel_on_disconnect(http_request, answer_query(request))
+
+async def answer_query(request: QueryRequest):
     try:
-        with get_db() as db:
-            logger.info("DB connection established successfully.")
-
-            # Extract schema
-            schema_info = extract_schema(db)
-            schema_str = json.dumps(schema_info, sort_keys=True) 
-            logger.info(f"Schema info extracted: {schema_info}")
-
-            # Optimize question
-            optimized_question = optimize_question(request.question)
-            logger.info(f"Optimized question: {optimized_question}")
-
-            #  Check LLM cache
-            cache_key_llm = make_hash_key(optimized_question + schema_str)
-            cached_llm = get_cache(cache_key_llm)
-            if cached_llm:
-                logger.info("LLM result found in cache.")
-                llm_result = json.loads(cached_llm)
-            else:
-                logger.info(f"Generating SQL for question: {optimized_question}")
-                llm_result = await generate_sql(
-                    optimized_question,
-                    schema_info,
-                    settings.OPENAI_API_KEY,
-                    return_usage=True
-                )
-                set_cache(cache_key_llm, llm_result, expire=600)  
-
-            sql_query = llm_result["sql"].replace('```sql', '').replace('```', '').strip()
-            token_usage = llm_result.get("token_usage", {})
-            logger.info(f"Generated SQL: {sql_query}")
-            logger.info(f"Token usage: {token_usage}")
-
-            # Validate SQL
-            logger.info("Validating the SQL query.")
-            is_valid = validate_sql(sql_query, allow_modifications=request.allow_modifications)
-            if not is_valid:
-                logger.error("Generated SQL is not safe to execute.")
-                raise ValueError("Generated SQL is not safe to execute.")
-
-            #  Check SELECT result cache
-            if sql_query.lower().strip().startswith("select"):
-                cache_key_result = make_hash_key(sql_query)
-                cached_result = get_cache(cache_key_result)
-                if cached_result:
-                    logger.info("Query result found in cache.")
-                    formatted_results = json.loads(cached_result)
-                else:
-                    logger.info("Executing the SQL query.")
-                    rows, columns = execute_query(db, sql_query)
-                    logger.info(f"Query executed successfully, fetched {len(rows)} rows.")
-                    formatted_results = format_results(rows, columns)
-                    set_cache(cache_key_result, formatted_results, expire=300)  # 5 minutes
-            else:
-                logger.info("Executing non-SELECT SQL query.")
-                rows, columns = execute_query(db, sql_query)
-                logger.info(f"Query executed successfully, fetched {len(rows)} rows.")
-                formatted_results = format_results(rows, columns)
+        #  Later pages come from the cursor's saved state, without the LLM or earlier pages
+        if request.cursor:
+            rows, columns, next_cursor, state = await run_db(run_next_page, request.cursor)
+            formatted_results = format_results(rows, columns, request.formats)
+            return QueryResponse(
+                sql_query=state["sql_query"],
+                **result_fields(formatted_results),
+                token_usage={},
+                params=state["params"],
+                next_cursor=next_cursor
+            )
 
+        resolved = await resolve_sql(request)
+        sql_query, params = resolved["sql_query"], resolved["params"]
+
+        if request.page_size and is_select(sql_query):
+            rows, columns, next_cursor = await run_db(
+                run_first_page, sql_query, params, request.page_size, resolved["read_only"]
+            )
+            remember_template(resolved)
+            formatted_results = format_results(rows, columns, request.formats)
             return QueryResponse(
                 sql_query=sql_query,
-                table=formatted_results["table"],
-                results=formatted_results["json"],
-                token_usage=token_usage
+                **result_fields(formatted_results),
+                token_usage=resolved["token_usage"],
+                params=params,
+                plan=resolved["plan"],
+                next_cursor=next_cursor
             )
 
+        #  Check SELECT result cache, concurrent misses for the same SQL share one execution
+        #  Only the requested representations are built and cached, so they are part of the key
+        stale = False
+        formats = tuple(sorted(set(request.formats)))
+        if is_select(sql_query):
+            cache_key_result = result_cache_key(
+                sql_query, params, "" if formats == OUTPUT_FORMATS else ",".join(formats)
+            )
+            cached_result, stale = get_swr_cache(cache_key_result)
+            if cached_result is not None:
+                logger.info(f"Query result found in cache (stale={stale}).")
+                formatted_results = cached_result
+                if stale:
+                    schedule_refresh(sql_query, cache_key_result, params, resolved["read_only"], formats)
+            else:
+                formatted_results = await result_flight.do(
+                    cache_key_result,
+                    lambda: execute_select(sql_query, cache_key_result, params, resolved["read_only"], formats)
+                )
+            remember_template(resolved)
+        else:
+            formatted_results = await run_db(run_modification, sql_query, formats)
+
+        return QueryResponse(
+            sql_query=sql_query,
+            **result_fields(formatted_results),
+            token_usage=resolved["token_usage"],
+            params=params,
+            plan=resolved["plan"],
+            stale=stale
+        )
+
     except Exception as e:
         logger.error(f"Error during query generation and execution: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+
+# Printable ASCII stays readable in the X-SQL-Query header, newlines and non-ASCII are escaped
+HEADER_SAFE = string.ascii_letters + string.digits + string.punctuation.replace("%", "") + " "
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@router.post("/query/stream")
+async def stream_query_results(
+    request: QueryRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$")
+):
+    """
+    Stream the rows of a generated SELECT as they are fetched.
+    - ndjson: a header frame {"sql_query", "params", "columns", "token_usage", "plan"}, then one object per row
+    - csv: the column header row, then rows; the SQL is in the X-SQL-Query response header
+    """
+    stack = None
+    try:
+        # Over the cost limits it's rejected, a LIMIT would silently truncate the download
+        resolved = await resolve_sql(request, allow_limit=False)
+        sql_query, params = resolved["sql_query"], resolved["params"]
+        if not is_select(sql_query):
+            raise ValueError("Only SELECT queries can be streamed.")
+
+        logger.info("Streaming the SQL query results.")
+        columns, batches, stack = await run_db(open_stream, sql_query, params, resolved["read_only"])
+        remember_template(resolved)
+
+    except Exception as e:
+        if stack is not None:
+            await run_db(stack.close)
+        logger.error(f"Error during query generation and execution: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+
+    if format == "csv":
+        chunks = csv_chunks(columns, batches)
+    else:
+        header = {
+            "sql_query": sql_query,
+            "params": params,
+            "columns": columns,
+            "token_usage": resolved["token_usage"],
+            "plan": resolved["plan"],
+        }
+        chunks = ndjson_chunks(header, columns, batches)
+
+    return StreamingResponse(
+        iterate_in_db_pool(chunks, stack),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"X-SQL-Query": quote(" ".join(sql_query.split()), safe=HEADER_SAFE)}
+    )
+
+EXPORT_MEDIA_TYPES = {"arrow": "application/vnd.apache.arrow.stream", "parquet": "application/vnd.apache.parquet"}
+
+@router.post("/query/export")
+async def export_query_results(
+    request: QueryRequest,
+    http_request: Request,
+    format: str = Query("arrow", pattern="^(arrow|parquet)$")
+):
+    """
+    Return the rows of a generated SELECT as an Arrow IPC stream or a Parquet file.
+    - Decimals, timestamps and intervals keep their types instead of the display strings of /query
+    - The SQL is in the X-SQL-Query response header and the schema metadata
+    - X-Result-Stale is "true" when a cached export past RESULT_CACHE_SOFT_TTL was served,
+      it is refreshed in the background like stale /query results
+    """
+    sql_query, payload, stale = await cancel_on_disconnect(http_request, export_query(request, format))
+    return Response(
+        content=payload,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "X-SQL-Query": quote(" ".join(sql_query.split()), safe=HEADER_SAFE),
+            "X-Result-Stale": "true" if stale else "false",
+        }
+    )
+
+async def export_query(request: QueryRequest, format: str):
+    try:
+        # Over the cost limits it's rejected, a LIMIT would silently truncate the download
+        resolved = await resolve_sql(request, allow_limit=False)
+        sql_query, params = resolved["sql_query"], resolved["params"]
+        if not is_select(sql_query):
+            raise ValueError("Only SELECT queries can be exported.")
+
+        #  The encoded bytes are cached like /query results and invalidated by writes to their tables
+        cache_key_export = result_cache_key(sql_query, params, f"export:{format}")
+
+        def export():
+            return run_db(run_export, sql_query, cache_key_export, format, params, resolved["read_only"])
+
+        payload, stale = get_swr_bytes_cache(cache_key_export)
+        if payload is not None:
+            logger.info(f"{format} export found in cache (stale={stale}).")
+            if stale:
+                refresh_in_background(cache_key_export, export)
+        else:
+            payload = await result_flight.do(cache_key_export, export)
+        remember_template(resolved)
+        return sql_query, payload, stale
+
+    except Exception as e:
+        logger.error(f"Error during query generation and export: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from db.schema_extractor.schema_snapshot import schema_snapshot
+from db.schema_extractor.session import replica_router, pool_stats
+from utils.singleflight import llm_flight, result_flight
+from utils.cache import cache_stats
+from utils.semantic_cache import semantic_cache
+
+router = APIRouter()
+
+@router.get("/stats")
+async def get_stats():
+    return {
+        "schema_snapshot": schema_snapshot.stats(),
+        "cache": cache_stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "replicas": replica_router.stats(),
+        "db_pools": pool_stats(),
+        "singleflight": {
+            "llm": llm_flight.stats(),
+            "result": result_flight.stats(),
+        },
+    }
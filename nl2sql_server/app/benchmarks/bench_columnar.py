@@ -0,0 +1,52 @@
+"""
+/v1/query response payload size and serialization time, per-row records
+("json" format) vs column arrays ("columnar" format), for narrow and wide
+results. Times cover format_results plus the JSON encoding of its output.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_columnar
+"""
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from utils.formatter import format_results
+
+ROWS = 50_000
+WIDTHS = [4, 16, 48]
+
+
+def make_result(width):
+    groups = range(width // 4)
+    columns = [f"{name}_{i}" for i in groups for name in ("order_id", "unit_price", "created_at", "status")]
+    start = datetime(2024, 1, 1)
+    rows = []
+    for n in range(ROWS):
+        values = (n, Decimal(n % 1000) / 10, start + timedelta(minutes=n), "shipped" if n % 3 else "pending")
+        rows.append(values * len(groups))
+    return rows, columns
+
+
+def measure(rows, columns, fmt, key):
+    start = time.perf_counter()
+    formatted = format_results(rows, columns, [fmt])
+    payload = json.dumps({name: formatted[name] for name in key})
+    return len(payload.encode()), time.perf_counter() - start
+
+
+def main():
+    print(f"{ROWS} rows")
+    for width in WIDTHS:
+        rows, columns = make_result(width)
+        records_size, records_time = measure(rows, columns, "json", ["json"])
+        columnar_size, columnar_time = measure(rows, columns, "columnar", ["columns", "data"])
+        print(
+            f"  {width:>3} columns  records={records_size / 1024 / 1024:7.1f} MiB {records_time:6.2f}s  "
+            f"columnar={columnar_size / 1024 / 1024:7.1f} MiB {columnar_time:6.2f}s  "
+            f"size x{records_size / columnar_size:4.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Throughput of fast /v1/query requests while one slow query is running,
+with DB work inline on the event loop vs offloaded to the DB thread pool.
+
+The database and the LLM are simulated: the slow query blocks its thread for
+SLOW_QUERY_SECONDS like a driver call would, the LLM call awaits LLM_SECONDS.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_event_loop
+"""
+import os
+import time
+import asyncio
+import statistics
+from contextlib import ExitStack
+from unittest.mock import patch
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+import httpx
+from loguru import logger
+from core.config import settings
+from main import app
+
+FAST_REQUESTS = 200
+SLOW_QUERY_SECONDS = 2.0
+LLM_SECONDS = 0.05
+FAST_QUERY_SECONDS = 0.002
+
+
+async def fake_generate_sql(question, schema, api_key, return_usage=False):
+    await asyncio.sleep(LLM_SECONDS)
+    if "slow" in question:
+        return {"sql": "SELECT pg_sleep(2);", "token_usage": {}}
+    return {"sql": f"SELECT {abs(hash(question))};", "token_usage": {}}
+
+
+def fake_execute_query(db, sql, params=None):
+    time.sleep(SLOW_QUERY_SECONDS if "pg_sleep" in sql else FAST_QUERY_SECONDS)
+    return [(1,)], ["value"]
+
+
+async def run_inline(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def scenario(client):
+    """Fire the slow request, then FAST_REQUESTS arrivals spread over the slow query's duration."""
+    loop = asyncio.get_running_loop()
+
+    async def ask(question, arrival):
+        await asyncio.sleep(max(0.0, arrival - loop.time()))
+        response = await client.post("/v1/query", json={"question": question})
+        assert response.status_code == 200, response.text
+        # Measured from the intended arrival, so time spent waiting on a blocked loop counts
+        return loop.time() - arrival
+
+    start = loop.time()
+    interval = SLOW_QUERY_SECONDS / FAST_REQUESTS
+    slow = asyncio.create_task(ask("slow report", start))
+    latencies = await asyncio.gather(*(
+        ask(f"fast question {i}", start + LLM_SECONDS + i * interval) for i in range(FAST_REQUESTS)
+    ))
+    elapsed = loop.time() - start
+    await slow
+    return latencies, elapsed
+
+
+async def measure(label, offload):
+    with ExitStack() as stack:
+        if not offload:
+            stack.enter_context(patch("api.v1.endpoints.query.run_db", run_inline))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            latencies, elapsed = await scenario(client)
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    print(
+        f"  {label:<22} {FAST_REQUESTS / elapsed:7.1f} req/s  "
+        f"p50={statistics.median(latencies_ms):7.1f}ms  "
+        f"p99={latencies_ms[int(len(latencies_ms) * 0.99) - 1]:7.1f}ms"
+    )
+
+
+async def main():
+    logger.remove()
+    settings.SEMANTIC_CACHE_ENABLED = False
+    settings.SQL_TEMPLATES_ENABLED = False
+
+    with ExitStack() as stack:
+        for target, value in {
+            "get_schema": lambda db: {"users": ["id"]},
+            "get_schema_tables": lambda: None,
+            "get_schema_fingerprint": lambda: None,
+            "build_schema_context": lambda question, tables, schema: ("", {}),
+            "generate_sql": fake_generate_sql,
+            "execute_query": fake_execute_query,
+            "get_cache": lambda key: None,
+            "set_cache": lambda *args, **kwargs: None,
+            "get_swr_cache": lambda key: (None, False),
+            "set_swr_cache": lambda *args, **kwargs: None,
+            "tag_cache_key": lambda *args, **kwargs: None,
+        }.items():
+            stack.enter_context(patch(f"api.v1.endpoints.query.{target}", value))
+
+        print(f"{FAST_REQUESTS} fast requests arriving while one {SLOW_QUERY_SECONDS:.0f}s query runs")
+        await measure("inline (event loop)", offload=False)
+        await measure("DB thread pool", offload=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
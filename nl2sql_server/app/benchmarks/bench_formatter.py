@@ -0,0 +1,83 @@
+"""
+format_results time at growing row counts: the previous per-cell pandas
+`apply` implementation vs the column-at-a-time conversion in utils.formatter.
+Rows mimic `SELECT * FROM order_items JOIN orders` (ints, Decimal, timestamps,
+intervals, text, with some NULLs).
+
+Run from the app/ directory:
+    python -m benchmarks.bench_formatter
+"""
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+from utils.formatter import format_results
+
+ROW_COUNTS = [10_000, 100_000, 1_000_000]
+COLUMNS = ["order_item_id", "quantity", "price", "created_at", "shipping_time", "note"]
+
+
+def legacy_format_results(rows, columns):
+    """format_results as it was before the vectorized conversion."""
+    if not rows:
+        return {"table": "No results returned", "json": []}
+
+    df = pd.DataFrame(rows, columns=columns)
+
+    for col in df.columns:
+        if df[col].apply(lambda x: isinstance(x, Decimal)).any():
+            df[col] = df[col].apply(lambda x: float(x) if pd.notnull(x) else x)
+
+    for col in df.select_dtypes(include=['datetime']).columns:
+        df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+
+    for col in df.columns:
+        if df[col].apply(lambda x: isinstance(x, pd.Timedelta)).any():
+            df[col] = df[col].apply(lambda x: x.total_seconds() / 86400 if pd.notnull(x) else x)
+
+    for col in df.select_dtypes(include=[np.number]).columns:
+        if 'id' not in col.lower():
+            df[col] = df[col].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else x)
+        else:
+            df[col] = df[col].apply(lambda x: int(x) if pd.notnull(x) else x)
+
+    table = tabulate(df, headers='keys', tablefmt='psql', showindex=False)
+    json_result = df.to_dict(orient='records')
+
+    return {"table": table, "json": json_result}
+
+
+def make_rows(count):
+    start = datetime(2024, 1, 1)
+    return [
+        (
+            i,
+            i % 5 + 1,
+            Decimal(i % 1000) / 10 if i % 50 else None,
+            start + timedelta(minutes=i),
+            timedelta(hours=i % 72),
+            f"item {i}",
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    fn(rows, COLUMNS)
+    return time.perf_counter() - start
+
+
+def main():
+    for count in ROW_COUNTS:
+        rows = make_rows(count)
+        legacy = timed(legacy_format_results, rows)
+        vectorized = timed(format_results, rows)
+        print(f"{count:>9} rows  legacy={legacy:7.2f}s  vectorized={vectorized:7.2f}s  x{legacy / vectorized:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Per-call AsyncOpenAI client vs the shared pooled client, against a local stub server.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_openai_client
+"""
+import os
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+import openai
+from core.config import settings
+from llm.client import get_openai_client, close_openai_clients
+
+CALLS = 200
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4",
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "SELECT 1;"},
+        "finish_reason": "stop",
+    }],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+async def complete(client):
+    await client.chat.completions.create(
+        model="gpt-4",
+        messages=[{"role": "user", "content": "bench"}],
+        max_tokens=1,
+    )
+
+
+async def per_call_clients(base_url):
+    for _ in range(CALLS):
+        client = openai.AsyncOpenAI(api_key="bench-key", base_url=base_url)
+        await complete(client)
+        await client.close()
+
+
+async def shared_client():
+    client = get_openai_client("bench-key")
+    for _ in range(CALLS):
+        await complete(client)
+    await close_openai_clients()
+
+
+async def measure(label, coro):
+    StubHandler.connections = 0
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<18} {elapsed * 1000 / CALLS:7.2f} ms/call  {StubHandler.connections:4d} connections")
+
+
+async def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    settings.OPENAI_BASE_URL = base_url
+
+    try:
+        print(f"{CALLS} sequential chat completions against {base_url}")
+        await measure("per-call client", per_call_clients(base_url))
+        await measure("shared client", shared_client())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
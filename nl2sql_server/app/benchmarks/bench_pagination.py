@@ -0,0 +1,86 @@
+"""
+Time to fetch page N of a 200k-row result: re-running the query with OFFSET
+vs keyset cursors vs a spilled result file (SQLite file database, page size 100).
+
+Run from the app/ directory:
+    python -m benchmarks.bench_pagination
+"""
+import os
+import time
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+from diskcache import Cache
+from loguru import logger
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from core.config import settings
+from utils import cache as cache_module
+from db.sql_executor.sql_executor import execute_query
+from services.pagination import first_page, next_page
+
+ROWS = 200_000
+PAGE_SIZE = 100
+TARGET_PAGES = [1, 10, 100, 1000]
+TABLES = {"order_items": {"columns": [], "primary_key": ["order_item_id"], "foreign_keys": []}}
+KEYSET_SQL = "SELECT * FROM order_items WHERE quantity > 1"
+SPILL_SQL = "SELECT * FROM order_items WHERE quantity > 1 ORDER BY price DESC, order_item_id"
+
+
+def populate(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE order_items (order_item_id INTEGER PRIMARY KEY, order_id INTEGER, "
+            "product_id INTEGER, quantity INTEGER, price NUMERIC, note TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO order_items (order_id, product_id, quantity, price, note) VALUES (:o, :p, :q, :pr, :n)"),
+            [{"o": i // 4, "p": i % 997, "q": i % 5 + 1, "pr": (i % 1000) / 10, "n": f"item {i}"} for i in range(ROWS)],
+        )
+
+
+def offset_page(db, sql, page):
+    start = time.perf_counter()
+    execute_query(db, f"{sql} LIMIT {PAGE_SIZE} OFFSET {(page - 1) * PAGE_SIZE}")
+    return time.perf_counter() - start
+
+
+def cursor_pages(db, sql):
+    """Walk the cursors, timing each page in TARGET_PAGES."""
+    timings = {}
+    start = time.perf_counter()
+    _, _, cursor = first_page(db, sql, None, PAGE_SIZE, TABLES)
+    timings[1] = time.perf_counter() - start
+    for page in range(2, max(TARGET_PAGES) + 1):
+        start = time.perf_counter()
+        _, _, cursor, _ = next_page(db, cursor)
+        if page in TARGET_PAGES:
+            timings[page] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    logger.remove()
+    with tempfile.TemporaryDirectory() as directory:
+        cache_module.cache = Cache(os.path.join(directory, "cache"))
+        settings.PAGINATION_SPILL_DIR = os.path.join(directory, "spill")
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        populate(engine)
+
+        with sessionmaker(bind=engine)() as db:
+            for label, sql in (("keyset", KEYSET_SQL), ("spill", SPILL_SQL)):
+                timings = cursor_pages(db, sql)
+                print(f"{label}: {sql}")
+                for page in TARGET_PAGES:
+                    print(
+                        f"  page {page:>5}  OFFSET re-run={offset_page(db, sql, page) * 1000:8.2f}ms  "
+                        f"cursor={timings[page] * 1000:8.2f}ms"
+                    )
+        cache_module.cache.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
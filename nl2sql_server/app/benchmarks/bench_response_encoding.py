@@ -0,0 +1,93 @@
+"""
+End-to-end /v1/query-style response latency and wire size for a 50k-row result,
+serialized by FastAPI through response_model, uncompressed, gzip and brotli
+(through the same compression middleware as main.py), plus the result cache
+codec (json vs orjson dumps + loads). Runs in-process with TestClient,
+so latency excludes the network but includes encoding and decompression.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_response_encoding
+"""
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+import orjson
+from brotli_asgi import BrotliMiddleware
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.config import settings
+from models.schemas import QueryResponse
+from utils.formatter import format_results
+
+ROWS = 50_000
+REPEATS = 5
+ENCODINGS = ["identity", "gzip", "br"]
+SQL = "SELECT order_item_id, order_id, quantity, price, created_at, note FROM order_items"
+
+
+def make_results():
+    start = datetime(2024, 1, 1)
+    rows = [
+        (i, i // 4, i % 5 + 1, Decimal(i % 1000) / 10, start + timedelta(minutes=i), f"item {i}")
+        for i in range(ROWS)
+    ]
+    return format_results(rows, ["order_item_id", "order_id", "quantity", "price", "created_at", "note"], ["json"])
+
+
+def make_app(formatted):
+    app = FastAPI()
+    app.add_middleware(
+        BrotliMiddleware,
+        quality=settings.RESPONSE_BROTLI_QUALITY,
+        minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+        gzip_fallback=True
+    )
+
+    def respond():
+        return QueryResponse(sql_query=SQL, results=formatted["json"], token_usage={})
+
+    app.post("/query", response_model=QueryResponse)(respond)
+    return app
+
+
+def time_requests(client, path, encoding):
+    elapsed, wire_bytes = [], 0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.post(path, headers={"Accept-Encoding": encoding})
+        assert len(response.json()["results"]) == ROWS
+        elapsed.append(time.perf_counter() - start)
+        wire_bytes = response.num_bytes_downloaded
+    return min(elapsed), wire_bytes
+
+
+def time_codec(dumps, loads, value):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        loads(dumps(value))
+    return (time.perf_counter() - start) / REPEATS
+
+
+def main():
+    formatted = make_results()
+    client = TestClient(make_app(formatted))
+
+    print(f"{ROWS} rows, best of {REPEATS}")
+    for encoding in ENCODINGS:
+        elapsed, wire_bytes = time_requests(client, "/query", encoding)
+        print(f"  {encoding:<9} {elapsed * 1000:8.1f} ms  {wire_bytes / 1024:9.1f} KiB")
+
+    entry = {"value": formatted, "fresh_until": time.time()}
+    json_codec = time_codec(json.dumps, json.loads, entry)
+    orjson_codec = time_codec(orjson.dumps, orjson.loads, entry)
+    print(f"  cache codec  json={json_codec * 1000:.1f} ms  orjson={orjson_codec * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare inspector vs bulk schema reflection on a generated 500-table schema.
+
+Requires a PostgreSQL DATABASE_URL. Run from the app/ directory:
+    python -m benchmarks.bench_schema_reflection
+"""
+import os
+import time
+import statistics
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db.schema_extractor.schema_extractor import reflect_schema
+
+BENCH_SCHEMA = "nl2sql_bench"
+TABLE_COUNT = 500
+COLUMNS_PER_TABLE = 8
+REPEATS = 3
+
+
+def create_bench_schema(conn):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    for i in range(TABLE_COUNT):
+        columns = ", ".join(f"col_{c} VARCHAR(64)" for c in range(COLUMNS_PER_TABLE))
+        parent_fk = f", parent_id INTEGER REFERENCES {BENCH_SCHEMA}.table_{i - 1}(id)" if i else ""
+        conn.execute(text(
+            f"CREATE TABLE {BENCH_SCHEMA}.table_{i} (id SERIAL PRIMARY KEY, {columns}{parent_fk})"
+        ))
+
+
+def time_mode(session_factory, mode):
+    timings = []
+    for _ in range(REPEATS):
+        with session_factory() as db:
+            start = time.perf_counter()
+            tables = reflect_schema(db, mode=mode)
+            timings.append(time.perf_counter() - start)
+    assert len(tables) == TABLE_COUNT, f"{mode} reflected {len(tables)} tables"
+    return timings
+
+
+def main():
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url or not database_url.startswith("postgresql"):
+        raise Exception("DATABASE_URL must point to a PostgreSQL database for this benchmark!")
+
+    admin_engine = create_engine(database_url)
+    with admin_engine.begin() as conn:
+        create_bench_schema(conn)
+
+    engine = create_engine(database_url, connect_args={"options": f"-csearch_path={BENCH_SCHEMA}"})
+    session_factory = sessionmaker(bind=engine)
+
+    try:
+        results = {mode: time_mode(session_factory, mode) for mode in ("inspector", "bulk")}
+        print(f"{TABLE_COUNT} tables x {COLUMNS_PER_TABLE + 2} columns, best of {REPEATS}")
+        for mode, timings in results.items():
+            print(f"  {mode:<10} best={min(timings):.3f}s median={statistics.median(timings):.3f}s")
+        print(f"  speedup    {min(results['inspector']) / min(results['bulk']):.1f}x")
+    finally:
+        engine.dispose()
+        with admin_engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        admin_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
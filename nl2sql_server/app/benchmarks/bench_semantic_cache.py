@@ -0,0 +1,80 @@
+"""
+Semantic cache lookup latency with 100k stored questions.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_semantic_cache
+"""
+import os
+import time
+import random
+import tempfile
+import statistics
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+from utils.semantic_cache import SemanticCache
+
+STORED = 100_000
+LOOKUPS = 2_000
+
+METRICS = ["revenue", "order count", "average rating", "total spend", "refund amount", "stock level"]
+ENTITIES = ["products", "users", "categories", "coupons", "orders", "reviews", "payments", "shipments"]
+GROUPINGS = ["month", "week", "day", "category", "country", "city", "status", "payment method"]
+FILTERS = ["", "in 2023", "in 2024", "for premium users", "with rating above 4", "shipped late", "paid by card"]
+
+
+def make_question(rng):
+    return (
+        f"{rng.choice(['show', 'list', 'what is the'])} top {rng.randint(1, 500)} "
+        f"{rng.choice(ENTITIES)} by {rng.choice(METRICS)} per {rng.choice(GROUPINGS)} {rng.choice(FILTERS)}"
+    )
+
+
+def percentile(values, pct):
+    return sorted(values)[int(len(values) * pct / 100) - 1]
+
+
+def time_lookups(cache, questions):
+    timings = []
+    hits = 0
+    for question in questions:
+        start = time.perf_counter()
+        if cache.lookup(question, "fp"):
+            hits += 1
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, hits
+
+
+def main():
+    rng = random.Random(7)
+    stored = list({make_question(rng) for _ in range(STORED * 2)})[:STORED]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SemanticCache(directory=os.path.join(directory, "semantic"))
+        start = time.perf_counter()
+        cache.lookup("warm up", "fp")
+        # One SQLite transaction for the bulk load, live traffic commits per add
+        with cache._index.transact():
+            for i, question in enumerate(stored):
+                cache.add(question, f"SELECT {i};", "fp")
+        print(f"indexed {len(stored)} questions in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        restarted = SemanticCache(directory=os.path.join(directory, "semantic"))
+        restarted.lookup("warm up", "fp")
+        print(f"reloaded persisted index in {time.perf_counter() - start:.1f}s")
+
+        repeats = [question.replace("show", "list").upper() + "?" for question in rng.sample(stored, LOOKUPS // 2)]
+        misses = [make_question(rng) + " excluding returns" for _ in range(LOOKUPS // 2)]
+
+        for label, questions in (("near-duplicates", repeats), ("unseen", misses)):
+            timings, hits = time_lookups(restarted, questions)
+            print(
+                f"  {label:<16} p50={statistics.median(timings):.3f}ms "
+                f"p99={percentile(timings, 99):.3f}ms hits={hits}/{len(questions)}"
+            )
+
+
+if __name__ == "__main__":
+    main()
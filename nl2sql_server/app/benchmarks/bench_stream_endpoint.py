@@ -0,0 +1,115 @@
+"""
+Time to first byte and total time for a large export through /v1/query (buffered)
+vs /v1/query/stream (NDJSON and CSV), served by uvicorn over a SQLite file database.
+The LLM is stubbed so only execution, formatting and transfer are measured.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_stream_endpoint
+"""
+import os
+import time
+import socket
+import tempfile
+import threading
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+import httpx
+import uvicorn
+from loguru import logger
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from core.config import settings
+from main import app
+
+ROWS = 200_000
+SQL = "SELECT * FROM order_items"
+
+
+def populate(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE order_items (order_item_id INTEGER PRIMARY KEY, order_id INTEGER, "
+            "product_id INTEGER, quantity INTEGER, price NUMERIC, note TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO order_items (order_id, product_id, quantity, price, note) VALUES (:o, :p, :q, :pr, :n)"),
+            [{"o": i // 4, "p": i % 997, "q": i % 5 + 1, "pr": (i % 1000) / 10, "n": f"item {i}"} for i in range(ROWS)],
+        )
+
+
+async def fake_generate_sql(question, schema, api_key, return_usage=False):
+    return {"sql": SQL, "token_usage": {}}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure(client, label, path):
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+    with client.stream("POST", path, json={"question": "export all order items"}) as response:
+        assert response.status_code == 200, response.read()
+        for chunk in response.iter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            size += len(chunk)
+    total = time.perf_counter() - start
+    print(f"  {label:<20} first byte={first_byte * 1000:8.1f}ms  total={total:6.2f}s  {size / 1024 / 1024:6.1f} MiB")
+
+
+def main():
+    logger.remove()
+    settings.SEMANTIC_CACHE_ENABLED = False
+    settings.SQL_TEMPLATES_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as directory, ExitStack() as stack:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        populate(engine)
+        SessionLocal = sessionmaker(bind=engine)
+
+        @contextmanager
+        def bench_get_db(read_only=False):
+            with SessionLocal() as session:
+                yield session
+
+        for target, value in {
+            "get_db": bench_get_db,
+            "get_schema": lambda db: {"order_items": ["order_item_id"]},
+            "get_schema_tables": lambda: None,
+            "build_schema_context": lambda question, tables, schema: ("", {}),
+            "generate_sql": fake_generate_sql,
+            "get_cache": lambda key: None,
+            "set_cache": lambda *args, **kwargs: None,
+            "get_swr_cache": lambda key: (None, False),
+            "set_swr_cache": lambda *args, **kwargs: None,
+            "tag_cache_key": lambda *args, **kwargs: None,
+        }.items():
+            stack.enter_context(patch(f"api.v1.endpoints.query.{target}", value))
+
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+        try:
+            print(f"{SQL} ({ROWS} rows)")
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                measure(client, "buffered /query", "/v1/query")
+                measure(client, "stream ndjson", "/v1/query/stream")
+                measure(client, "stream csv", "/v1/query/stream?format=csv")
+        finally:
+            server.should_exit = True
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
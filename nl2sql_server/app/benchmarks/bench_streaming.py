@@ -0,0 +1,80 @@
+"""
+Peak Python memory of fetchall + format_results vs server-side cursor streaming,
+for a `SELECT * FROM order_items` at growing row counts (SQLite file database).
+Timings include tracemalloc overhead and are only comparable with each other.
+
+Run from the app/ directory:
+    python -m benchmarks.bench_streaming
+"""
+import os
+import time
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OPENAI_API_KEY", "bench-key")
+
+from loguru import logger
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from db.sql_executor.sql_executor import execute_query, stream_query
+from utils.formatter import format_results
+
+ROW_COUNTS = [20_000, 100_000, 300_000]
+SQL = "SELECT * FROM order_items"
+
+
+def populate(engine, rows):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS order_items"))
+        conn.execute(text(
+            "CREATE TABLE order_items (order_item_id INTEGER PRIMARY KEY, order_id INTEGER, "
+            "product_id INTEGER, quantity INTEGER, price NUMERIC, note TEXT)"
+        ))
+        conn.execute(
+            text("INSERT INTO order_items (order_id, product_id, quantity, price, note) VALUES (:o, :p, :q, :pr, :n)"),
+            [{"o": i // 4, "p": i % 997, "q": i % 5 + 1, "pr": (i % 1000) / 10, "n": f"item {i}"} for i in range(rows)],
+        )
+
+
+def fetch_all(session):
+    rows, columns = execute_query(session, SQL)
+    return len(format_results(rows, columns)["json"])
+
+
+def stream(session):
+    columns, batches = stream_query(session, SQL)
+    total = 0
+    for batch in batches:
+        total += len(format_results(batch, columns)["json"])
+    return total
+
+
+def measure(SessionLocal, fn):
+    with SessionLocal() as session:
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = fn(session)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return count, peak / 1024 / 1024, elapsed
+
+
+def main():
+    logger.remove()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        SessionLocal = sessionmaker(bind=engine)
+        for rows in ROW_COUNTS:
+            populate(engine, rows)
+            print(f"{rows} rows")
+            for label, fn in (("fetchall", fetch_all), ("stream", stream)):
+                count, peak_mb, elapsed = measure(SessionLocal, fn)
+                assert count == rows
+                print(f"  {label:<10} peak={peak_mb:8.1f} MiB  {elapsed:6.2f}s")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
-from typing import ClassVar
+from typing import ClassVar, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
@@ -9,6 +9,48 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 1800
+    DB_THREADPOOL_SIZE: Optional[int] = None  # defaults to DB_POOL_SIZE + DB_MAX_OVERFLOW
+    REPLICA_DATABASE_URLS: str = ""  # comma separated, read-only SELECTs are routed here
+    REPLICA_BALANCING: str = "round_robin"  # "round_robin" or "least_connections"
+    REPLICA_HEALTH_CHECK_INTERVAL: float = 10.0
+    STREAM_BATCH_SIZE: int = 1000
+    STATEMENT_TIMEOUT_MS: int = 30000  # PostgreSQL statement_timeout per statement, 0 disables
+    DISCONNECT_POLL_INTERVAL: float = 0.5
+    PAGINATION_CURSOR_TTL: int = 900
+    PAGINATION_SPILL_DIR: str = ".nl2sql_cache/spill"
+    COST_GUARD_ENABLED: bool = True  # PostgreSQL only
+    COST_GUARD_MAX_COST: float = 1_000_000.0
+    COST_GUARD_MAX_ROWS: int = 1_000_000
+    COST_GUARD_ACTION: str = "limit"  # "limit" or "reject"
+    COST_GUARD_LIMIT_ROWS: int = 1000
+    COST_GUARD_CACHE_TTL: int = 600
+    SCHEMA_FINGERPRINT_CHECK_INTERVAL: float = 5.0
+    SCHEMA_REFLECTION_MODE: str = "bulk"  # "bulk" or "inspector"
+    SCHEMA_PRUNING_ENABLED: bool = True
+    SCHEMA_PRUNE_FK_DEPTH: int = 1
+    LLM_MODEL: str = "gpt-4"
+    LLM_MAX_TOKENS: int = 250
+    LLM_PROMPT_TOKEN_BUDGET: int = 6000
+    OPENAI_BASE_URL: Optional[str] = None
+    OPENAI_MAX_CONNECTIONS: int = 100
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENAI_KEEPALIVE_EXPIRY: float = 60.0
+    OPENAI_TIMEOUT: float = 30.0
+    OPENAI_CONNECT_TIMEOUT: float = 5.0
+    CACHE_MEMORY_MAX_ENTRIES: int = 1024
+    CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_MEMORY_TTL: int = 30
+    RESULT_CACHE_TTL: int = 3600
+    RESULT_CACHE_SOFT_TTL: int = 300  # served stale and refreshed in the background after this
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024  # bytes, smaller responses are sent uncompressed
+    RESPONSE_BROTLI_QUALITY: int = 4  # 0-11, gzip is used for clients without brotli support
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_DIR: Optional[str] = ".nl2sql_cache/semantic"
+    SEMANTIC_CACHE_THRESHOLD: float = 0.8
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 100000
+    SQL_TEMPLATES_ENABLED: bool = True
+    SQL_TEMPLATE_TTL: int = 86400
+    SQL_TEMPLATE_MAX_VARIANTS: int = 8
 
     model_config: ClassVar[ConfigDict] = ConfigDict(env_file=".env")
 
@@ -0,0 +1,140 @@
+import bisect
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds of the checkout wait histogram buckets, in milliseconds
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class PoolMetrics:
+    """
+    Counters for one connection pool, fed by pool events and InstrumentedQueuePool.
+    - Checkout wait is the time a caller spends in pool.connect(), including opening new connections
+    - Timeouts are checkouts that gave up after DB_POOL_TIMEOUT
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0, "timeouts": 0}
+            self.peak_in_use = 0
+            self.peak_overflow = 0
+            self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+
+    def count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        wait_ms = seconds * 1000
+        with self._lock:
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+            if timed_out:
+                self.counts["timeouts"] += 1
+
+    def record_usage(self, pool):
+        with self._lock:
+            self.peak_in_use = max(self.peak_in_use, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def wait_percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of waits (None past the last bucket)."""
+        total = sum(self.buckets)
+        if not total:
+            return 0.0
+        seen = 0
+        for bound, count in zip(WAIT_BUCKETS_MS + [None], self.buckets):
+            seen += count
+            if seen >= fraction * total:
+                return bound
+        return None
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            waits = sum(self.buckets)
+            return {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "peak_in_use": self.peak_in_use,
+                "peak_overflow": max(self.peak_overflow, 0),
+                **self.counts,
+                "checkout_wait_ms": {
+                    "count": waits,
+                    "mean": round(self.wait_total_ms / waits, 3) if waits else 0.0,
+                    "max": round(self.wait_max_ms, 3),
+                    "p50": self.wait_percentile(0.5),
+                    "p95": self.wait_percentile(0.95),
+                    "p99": self.wait_percentile(0.99),
+                    "buckets": {
+                        **{f"le_{bound}": count for bound, count in zip(WAIT_BUCKETS_MS, self.buckets)},
+                        "le_inf": self.buckets[-1],
+                    },
+                },
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout, including the ones that time out."""
+
+    metrics = None
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() swaps in a new pool, the counters carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Attach PoolMetrics to an engine built with InstrumentedQueuePool."""
+    metrics = PoolMetrics(name)
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.count("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.count("checkouts")
+        metrics.record_usage(engine.pool)
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        metrics.count("checkins")
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.count("invalidations")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        metrics.count("invalidations")
+
+    return metrics
@@ -1,20 +1,139 @@
-from sqlalchemy import inspect
+from collections import OrderedDict
+from sqlalchemy import inspect, text
 from loguru import logger
+from core.config import settings
 
 schema_logger = logger.bind(schema_extractor=True)
 
-def extract_schema(db):
+# Bulk mode: two catalog round-trips regardless of how many tables exist.
+BULK_COLUMNS_SQL = text("""
+SELECT c.table_name, c.column_name, c.data_type,
+       c.character_maximum_length, c.numeric_precision, c.numeric_scale
+FROM information_schema.columns c
+JOIN information_schema.tables t
+  ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+WHERE c.table_schema = current_schema()
+  AND t.table_type = 'BASE TABLE'
+ORDER BY c.table_name, c.ordinal_position
+""")
+
+BULK_CONSTRAINTS_SQL = text("""
+SELECT tc.table_name, tc.constraint_type, kcu.column_name,
+       ref.table_name AS ref_table, ref.column_name AS ref_column
+FROM information_schema.table_constraints tc
+JOIN information_schema.key_column_usage kcu
+  ON kcu.constraint_schema = tc.constraint_schema
+ AND kcu.constraint_name = tc.constraint_name
+ AND kcu.table_name = tc.table_name
+LEFT JOIN information_schema.referential_constraints rc
+  ON rc.constraint_schema = tc.constraint_schema
+ AND rc.constraint_name = tc.constraint_name
+LEFT JOIN information_schema.key_column_usage ref
+  ON ref.constraint_schema = rc.unique_constraint_schema
+ AND ref.constraint_name = rc.unique_constraint_name
+ AND ref.ordinal_position = kcu.position_in_unique_constraint
+WHERE tc.table_schema = current_schema()
+  AND tc.constraint_type IN ('PRIMARY KEY', 'FOREIGN KEY')
+ORDER BY tc.table_name, tc.constraint_type, kcu.ordinal_position
+""")
+
+
+def _new_table():
+    return {"columns": [], "primary_key": [], "foreign_keys": []}
+
+
+def _catalog_type(data_type, char_length, precision, scale) -> str:
+    type_name = data_type.upper()
+    if char_length:
+        return f"{type_name}({char_length})"
+    if type_name == "NUMERIC" and precision is not None:
+        return f"{type_name}({precision}, {scale or 0})"
+    return type_name
+
+
+def reflect_schema_inspector(db):
+    inspector = inspect(db.bind)
+    tables = OrderedDict()
+
+    for table_name in inspector.get_table_names():
+        table = tables.setdefault(table_name, _new_table())
+        for column in inspector.get_columns(table_name):
+            table["columns"].append({"name": column["name"], "type": str(column["type"])})
+        table["primary_key"] = list(inspector.get_pk_constraint(table_name).get("constrained_columns") or [])
+        for fk in inspector.get_foreign_keys(table_name):
+            for column, ref_column in zip(fk["constrained_columns"], fk["referred_columns"]):
+                table["foreign_keys"].append({
+                    "column": column,
+                    "ref_table": fk["referred_table"],
+                    "ref_column": ref_column,
+                })
+
+    return tables
+
+
+def reflect_schema_bulk(db):
+    tables = OrderedDict()
+
+    for table_name, column_name, data_type, char_length, precision, scale in db.execute(BULK_COLUMNS_SQL):
+        tables.setdefault(table_name, _new_table())["columns"].append({
+            "name": column_name,
+            "type": _catalog_type(data_type, char_length, precision, scale),
+        })
+
+    for table_name, constraint_type, column_name, ref_table, ref_column in db.execute(BULK_CONSTRAINTS_SQL):
+        table = tables.get(table_name)
+        if table is None:
+            continue
+        if constraint_type == "PRIMARY KEY":
+            table["primary_key"].append(column_name)
+        elif ref_table:
+            table["foreign_keys"].append({
+                "column": column_name,
+                "ref_table": ref_table,
+                "ref_column": ref_column,
+            })
+
+    return tables
+
+
+def reflect_schema(db, mode: str = None):
+    """
+    Reflect tables, columns, primary keys and foreign keys.
+    - "bulk": two information_schema queries (PostgreSQL only)
+    - "inspector": SQLAlchemy inspector, several round-trips per table
+    """
+    mode = mode or settings.SCHEMA_REFLECTION_MODE
+    try:
+        if mode == "bulk" and db.bind.dialect.name == "postgresql":
+            return reflect_schema_bulk(db)
+        return reflect_schema_inspector(db)
+
+    except Exception as e:
+        schema_logger.error(f"Schema reflection failed: {e}")
+        raise
+
+
+def render_schema(tables) -> str:
+    schema_str = ""
+
+    for table_name, table in tables.items():
+        schema_str += f"Table {table_name}:\n"
+        foreign_keys = {fk["column"]: fk for fk in table["foreign_keys"]}
+        for column in table["columns"]:
+            line = f"  - {column['name']} ({column['type']})"
+            if column["name"] in table["primary_key"]:
+                line += " PK"
+            fk = foreign_keys.get(column["name"])
+            if fk:
+                line += f" FK -> {fk['ref_table']}.{fk['ref_column']}"
+            schema_str += line + "\n"
+
+    return schema_str
+
+
+def extract_schema(db, mode: str = None):
     try:
-        inspector = inspect(db.bind)
-        schema_str = ""
-        
-        for table_name in inspector.get_table_names():
-            schema_str += f"Table {table_name}:\n"
-            columns = inspector.get_columns(table_name)
-            for column in columns:
-                schema_str += f"  - {column['name']} ({column['type']})\n"
-        
-        return schema_str
+        return render_schema(reflect_schema(db, mode))
 
     except Exception as e:
         schema_logger.error(f"Schema extraction failed: {e}")
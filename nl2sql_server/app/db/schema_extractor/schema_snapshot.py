@@ -0,0 +1,129 @@
+import hashlib
+import threading
+import time
+from sqlalchemy import inspect, text
+from loguru import logger
+from core.config import settings
+from db.schema_extractor.schema_extractor import reflect_schema, render_schema
+
+schema_logger = logger.bind(schema_extractor=True)
+
+# Hash of every user relation/column/constraint OID in the current schema.
+# A single catalog scan, far cheaper than a full reflection.
+PG_FINGERPRINT_SQL = text("""
+SELECT md5(
+    coalesce((
+        SELECT string_agg(
+            c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':' || a.atttypid,
+            ',' ORDER BY c.oid, a.attnum
+        )
+        FROM pg_catalog.pg_class c
+        JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+        WHERE n.nspname = current_schema()
+          AND c.relkind IN ('r', 'p')
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+    ), '')
+    || '|' ||
+    coalesce((
+        SELECT string_agg(con.oid::text, ',' ORDER BY con.oid)
+        FROM pg_catalog.pg_constraint con
+        JOIN pg_catalog.pg_namespace n ON n.oid = con.connamespace
+        WHERE n.nspname = current_schema()
+    ), '')
+)
+""")
+
+SQLITE_FINGERPRINT_SQL = text(
+    "SELECT group_concat(name || ':' || coalesce(sql, ''), ';') FROM sqlite_master"
+)
+
+
+def schema_fingerprint(db) -> str:
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        return db.execute(PG_FINGERPRINT_SQL).scalar() or ""
+    if dialect == "sqlite":
+        raw = db.execute(SQLITE_FINGERPRINT_SQL).scalar() or ""
+    else:
+        raw = ",".join(sorted(inspect(db.bind).get_table_names()))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+class SchemaSnapshot:
+    """
+    Process-wide copy of the extracted schema.
+    - Rebuilt only when the catalog fingerprint changes
+    - Fingerprint is checked at most once per `check_interval` seconds
+    """
+
+    def __init__(self, reflector=reflect_schema, check_interval: float = 5.0):
+        self._reflector = reflector
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self.schema = None
+        self.tables = None
+        self.fingerprint = None
+        self.built_at = None
+        self.checked_at = None
+        self.rebuild_count = 0
+
+    @property
+    def age(self):
+        if self.built_at is None:
+            return None
+        return time.time() - self.built_at
+
+    def get(self, db):
+        with self._lock:
+            now = time.time()
+            if (
+                self.schema is not None
+                and self.checked_at is not None
+                and now - self.checked_at < self._check_interval
+            ):
+                return self.schema
+
+            fingerprint = schema_fingerprint(db)
+            self.checked_at = now
+            if self.schema is not None and fingerprint == self.fingerprint:
+                return self.schema
+
+            schema_logger.info(f"Schema fingerprint changed ({self.fingerprint} -> {fingerprint}), rebuilding snapshot.")
+            self.tables = self._reflector(db)
+            self.schema = render_schema(self.tables)
+            self.fingerprint = fingerprint
+            self.built_at = time.time()
+            self.rebuild_count += 1
+            return self.schema
+
+    def invalidate(self):
+        with self._lock:
+            self.schema = None
+            self.tables = None
+            self.fingerprint = None
+            self.checked_at = None
+
+    def stats(self) -> dict:
+        return {
+            "fingerprint": self.fingerprint,
+            "age_seconds": self.age,
+            "rebuild_count": self.rebuild_count,
+            "built_at": self.built_at,
+        }
+
+
+schema_snapshot = SchemaSnapshot(check_interval=settings.SCHEMA_FINGERPRINT_CHECK_INTERVAL)
+
+
+def get_schema(db):
+    return schema_snapshot.get(db)
+
+
+def get_schema_tables():
+    return schema_snapshot.tables
+
+
+def get_schema_fingerprint():
+    return schema_snapshot.fingerprint
@@ -1,24 +1,172 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import functools
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
+from loguru import logger
 from core.config import settings 
-from sqlalchemy.pool import QueuePool 
-
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=settings.DB_POOL_SIZE,           # Number of connections to keep in the pool
-    max_overflow=settings.DB_MAX_OVERFLOW,     # Extra connections beyond pool_size
-    pool_timeout=settings.DB_POOL_TIMEOUT,     # Wait time (in seconds) for getting a connection
-    pool_recycle=settings.DB_POOL_RECYCLE,     # Recycle connections after 30 minutes
-)
+from db.schema_extractor.pool_metrics import InstrumentedQueuePool, instrument_engine
+from db.sql_executor.sql_executor import StatementCanceller, current_canceller
+
+def make_engine(url: str, name: str = "primary"):
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,           # Number of connections to keep in the pool
+        max_overflow=settings.DB_MAX_OVERFLOW,     # Extra connections beyond pool_size
+        pool_timeout=settings.DB_POOL_TIMEOUT,     # Wait time (in seconds) for getting a connection
+        pool_recycle=settings.DB_POOL_RECYCLE,     # Recycle connections after 30 minutes
+    )
+    instrument_engine(engine, name)
+    return engine
+
+engine = make_engine(settings.DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only sessions among healthy replicas.
+    - "round_robin" or "least_connections" (fewest checked-out pool connections)
+    - A replica that fails `SELECT 1` or drops a connection is skipped until a later check passes
+    - Falls back to the primary when no replica is healthy
+    """
+
+    def __init__(self, primary, replicas, strategy: str = "round_robin", check_interval: float = 10.0):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.check_interval = check_interval
+        self._healthy = {id(replica): True for replica in self.replicas}
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self.checked_at = time.time()
+        self.routed = {"primary": 0, "replica": 0, "fallback": 0}
+        for replica in self.replicas:
+            event.listen(replica, "handle_error", functools.partial(self._on_error, replica))
+
+    def _on_error(self, replica, context):
+        if context.is_disconnect:
+            self.mark_down(replica)
+
+    def mark_down(self, replica):
+        if self._healthy.get(id(replica)):
+            logger.warning(f"Replica {replica.url.render_as_string(hide_password=True)} marked unhealthy.")
+        self._healthy[id(replica)] = False
+
+    def check_health(self):
+        for replica in self.replicas:
+            try:
+                with replica.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                self._healthy[id(replica)] = True
+            except Exception as e:
+                logger.warning(f"Replica health check failed: {str(e)}")
+                self.mark_down(replica)
+        self.checked_at = time.time()
+
+    def _maybe_check_health(self):
+        # Checks run in the background, requests never wait for a slow replica to answer
+        if time.time() - self.checked_at < self.check_interval:
+            return
+        if not self._check_lock.acquire(blocking=False):
+            return
+        self.checked_at = time.time()
+
+        def run():
+            try:
+                self.check_health()
+            finally:
+                self._check_lock.release()
+
+        threading.Thread(target=run, name="replica-health", daemon=True).start()
+
+    def pick(self, read_only: bool):
+        if not read_only or not self.replicas:
+            self.routed["primary"] += 1
+            return self.primary
+
+        self._maybe_check_health()
+        healthy = [replica for replica in self.replicas if self._healthy[id(replica)]]
+        if not healthy:
+            self.routed["fallback"] += 1
+            return self.primary
+
+        with self._lock:
+            if self.strategy == "least_connections":
+                chosen = min(healthy, key=lambda replica: replica.pool.checkedout())
+            else:
+                chosen = next(replica for replica in self._cycle if self._healthy[id(replica)])
+            self.routed["replica"] += 1
+        return chosen
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "routed": dict(self.routed),
+            "replicas": [
+                {
+                    "url": replica.url.render_as_string(hide_password=True),
+                    "healthy": self._healthy[id(replica)],
+                    "checked_out": replica.pool.checkedout(),
+                }
+                for replica in self.replicas
+            ],
+        }
+
+
+replica_urls = [url.strip() for url in settings.REPLICA_DATABASE_URLS.split(",") if url.strip()]
+
+replica_router = ReplicaRouter(
+    engine,
+    [make_engine(url, name=f"replica-{i}") for i, url in enumerate(replica_urls)],
+    strategy=settings.REPLICA_BALANCING,
+    check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL,
+)
+
+def pool_stats() -> dict:
+    """Pool metrics for the primary and each replica engine."""
+    return {
+        pool_engine.pool.metrics.name: pool_engine.pool.metrics.stats(pool_engine.pool)
+        for pool_engine in [engine, *replica_router.replicas]
+    }
+
 @contextmanager
-def get_db():
-    db = SessionLocal()
+def get_db(read_only: bool = False):
+    """Session on the primary, or on a replica when `read_only` and replicas are configured."""
+    db = SessionLocal(bind=replica_router.pick(read_only))
     try:
         yield db
     finally:
-        db.close()  
+        db.close()
+
+# Blocking DB work runs here instead of on the event loop. One thread per pooled
+# connection, so a thread never waits on pool_timeout because of its own siblings.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_THREADPOOL_SIZE or settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+    thread_name_prefix="db",
+)
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Run a blocking DB function in the DB thread pool and await its result.
+    - If the awaiting task is cancelled, the statement running in the thread is cancelled too
+    """
+    loop = asyncio.get_running_loop()
+    canceller = StatementCanceller()
+    context = contextvars.copy_context()
+    context.run(current_canceller.set, canceller)
+    future = loop.run_in_executor(db_executor, context.run, functools.partial(fn, *args, **kwargs))
+    try:
+        return await future
+    except asyncio.CancelledError:
+        # The thread keeps running until its statement notices, so release the backend now
+        canceller.cancel()
+        raise
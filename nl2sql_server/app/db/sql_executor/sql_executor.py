@@ -1,9 +1,62 @@
 import re
+import threading
+from contextvars import ContextVar
 from sqlalchemy import text
+from sqlalchemy.orm import Session
 from loguru import logger
+from core.config import settings
 
 sql_logger = logger.bind(sql_executor=True)
 
+class StatementCanceller:
+    """
+    Cancels the statement a DB thread is running on behalf of an awaiting task.
+    - psycopg2 connections are cancelled like pg_cancel_backend, sqlite3 ones are interrupted
+    - Statements started after cancel() fail immediately
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = None
+        self.cancelled = False
+
+    def attach(self, dbapi_connection):
+        with self._lock:
+            if self.cancelled:
+                raise RuntimeError("Statement cancelled before it started.")
+            self._cancel = getattr(dbapi_connection, "cancel", None) or getattr(dbapi_connection, "interrupt", None)
+
+    def detach(self):
+        with self._lock:
+            self._cancel = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._cancel is not None:
+                sql_logger.info("Cancelling the running statement.")
+                self._cancel()
+
+current_canceller = ContextVar("current_canceller", default=None)
+
+def prepare_connection(db):
+    """
+    Check out the session's connection for the next statement.
+    - Lets the current StatementCanceller reach it
+    - Sets a transaction-local statement_timeout on PostgreSQL
+    """
+    connection = db.connection() if isinstance(db, Session) else db
+    canceller = current_canceller.get()
+    if canceller is not None:
+        canceller.attach(connection.connection.dbapi_connection)
+    if settings.STATEMENT_TIMEOUT_MS and connection.dialect.name == "postgresql":
+        # set_config(..., true) is SET LOCAL with a bindable value
+        db.execute(
+            text("SELECT set_config('statement_timeout', :timeout, true)"),
+            {"timeout": f"{settings.STATEMENT_TIMEOUT_MS}ms"}
+        )
+    return canceller
+
 def sanitize_sql_query(sql: str) -> str:
     try:
         sql = re.sub(r'--.*$', '', sql, flags=re.MULTILINE)
@@ -13,26 +66,67 @@ def sanitize_sql_query(sql: str) -> str:
         sql_logger.error(f"Error during SQL sanitization: {e}")
         raise
 
-def execute_query(db, sql: str):
+def execute_query(db, sql: str, params: dict = None):
     try:
         sql_logger.info(f"Raw SQL before sanitization: {sql}")
         sql = sanitize_sql_query(sql)
         sql_logger.info(f"Sanitized SQL: {sql}")
 
-        sql = text(sql)
-        result = db.execute(sql)
+        canceller = prepare_connection(db)
+        try:
+            sql = text(sql)
+            result = db.execute(sql, params or {})
 
-        if result.returns_rows:
-            rows = result.fetchall()
-            columns = result.keys()
-            sql_logger.info(f"Query executed successfully. Rows fetched: {len(rows)}")
-        else:
-            rows = []
-            columns = []
-            sql_logger.info("Query executed successfully. No rows returned (e.g. DML operation).")
+            if result.returns_rows:
+                rows = result.fetchall()
+                columns = result.keys()
+                sql_logger.info(f"Query executed successfully. Rows fetched: {len(rows)}")
+            else:
+                rows = []
+                columns = []
+                sql_logger.info("Query executed successfully. No rows returned (e.g. DML operation).")
+        finally:
+            if canceller is not None:
+                canceller.detach()
 
         return rows, columns
 
     except Exception as e:
         sql_logger.error(f"SQL execution error: {e}")
         raise
+
+def stream_query(db, sql: str, params: dict = None, batch_size: int = None):
+    """
+    Execute `sql` on a server-side cursor and return (columns, batches).
+    - `batches` lazily yields lists of at most `batch_size` rows, so memory stays flat
+    - The session must stay open until `batches` is exhausted or closed
+    """
+    batch_size = batch_size or settings.STREAM_BATCH_SIZE
+    try:
+        sql = sanitize_sql_query(sql)
+        sql_logger.info(f"Streaming SQL (batch size {batch_size}): {sql}")
+        canceller = prepare_connection(db)
+        try:
+            result = db.execute(text(sql), params or {}, execution_options={"stream_results": True, "yield_per": batch_size})
+        finally:
+            if canceller is not None:
+                canceller.detach()
+    except Exception as e:
+        sql_logger.error(f"SQL execution error: {e}")
+        raise
+
+    if not result.returns_rows:
+        sql_logger.info("Query executed successfully. No rows returned (e.g. DML operation).")
+        return [], iter(())
+
+    def batches():
+        fetched = 0
+        try:
+            for partition in result.partitions(batch_size):
+                fetched += len(partition)
+                yield partition
+            sql_logger.info(f"Query streamed successfully. Rows fetched: {fetched}")
+        finally:
+            result.close()
+
+    return list(result.keys()), batches()
@@ -0,0 +1,38 @@
+import httpx
+import openai
+from loguru import logger
+from core.config import settings
+
+llm_logger = logger.bind(llm=True)
+
+# One AsyncOpenAI client (and HTTP connection pool) per API key for the whole process
+_clients = {}
+
+def get_openai_client(api_key: str = None):
+    api_key = api_key or settings.OPENAI_API_KEY
+    client = _clients.get(api_key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+        )
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=settings.OPENAI_BASE_URL,
+            http_client=http_client,
+        )
+        _clients[api_key] = client
+        llm_logger.info("Created shared OpenAI client.")
+    return client
+
+async def close_openai_clients():
+    while _clients:
+        _, client = _clients.popitem()
+        try:
+            await client.close()
+        except Exception as e:
+            llm_logger.error(f"Error closing OpenAI client: {e}")
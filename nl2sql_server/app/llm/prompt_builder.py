@@ -0,0 +1,117 @@
+import re
+from loguru import logger
+from core.config import settings
+from llm.tokens import count_tokens
+
+llm_logger = logger.bind(llm=True)
+
+PROMPT_RULES = """
+You are a PostgreSQL SQL expert. Given a database schema and a natural language question, generate a valid SQL query.
+
+Rules:
+- Output only the SQL query (no markdown, comments, or explanations).
+- Use correct PostgreSQL syntax.
+- Use exact table and column names as given in the schema.
+- Qualify ambiguous column names if needed.
+- Do not use aliases in WHERE or HAVING clauses.
+- Do not use window functions in HAVING or WHERE.
+- Use explicit JOINs, GROUP BYs, and ORDER BYs when needed.
+- PostgreSQL does not support INTERVAL '1 quarter' — use INTERVAL '3 months' instead.
+"""
+
+TREND_KEYWORDS = ["trend", "over time", "monthly average", "improve"]
+
+TREND_EXAMPLE = """
+
+Example (monthly rating trend check):
+
+WITH monthly_aggregates AS (
+    SELECT product_id, DATE_TRUNC('month', created_at) AS month, AVG(rating) AS avg_rating
+    FROM reviews
+    GROUP BY product_id, month
+),
+with_lag AS (
+    SELECT *, LAG(avg_rating) OVER (PARTITION BY product_id ORDER BY month) AS prev_avg_rating
+    FROM monthly_aggregates
+)
+SELECT *
+FROM with_lag
+WHERE avg_rating > prev_avg_rating;
+"""
+
+COLUMN_LINE = re.compile(r"^\s+- (\w+) \(")
+
+
+def _is_low_priority(line: str, question_words: set) -> bool:
+    match = COLUMN_LINE.match(line)
+    if not match:
+        return False  # table headers are always kept
+    if " PK" in line or " FK -> " in line:
+        return False
+    return match.group(1).lower() not in question_words
+
+
+def _fit_schema(schema: str, question: str, tokens_over: int, model: str):
+    """Drop low-priority column lines, last table first, until `tokens_over` tokens are freed."""
+    lines = schema.splitlines(keepends=True)
+    question_words = set(re.findall(r"\w+", question.lower()))
+    dropped = set()
+    freed = 0
+
+    for index in range(len(lines) - 1, -1, -1):
+        if freed >= tokens_over:
+            break
+        if _is_low_priority(lines[index], question_words):
+            dropped.add(index)
+            freed += count_tokens(lines[index], model)
+
+    kept = "".join(line for index, line in enumerate(lines) if index not in dropped)
+    return kept, len(dropped)
+
+
+def build_prompt(question: str, schema: str, budget: int = None, model: str = None):
+    """
+    Assemble the SQL generation prompt within a token budget.
+    - Sections: rules and question (always kept), schema, examples
+    - Over budget: drop examples first, then low-priority schema columns
+    - Returns the prompt and a per-section token breakdown
+    """
+    budget = budget or settings.LLM_PROMPT_TOKEN_BUDGET
+    model = model or settings.LLM_MODEL
+
+    question_section = f'\nQuestion: "{question}"\n'
+    examples = TREND_EXAMPLE if any(k in question.lower() for k in TREND_KEYWORDS) else ""
+
+    counts = {
+        "rules": count_tokens(PROMPT_RULES, model),
+        "schema": count_tokens(schema, model),
+        "question": count_tokens(question_section, model),
+        "examples": count_tokens(examples, model),
+    }
+    dropped_examples = 0
+    dropped_columns = 0
+
+    if sum(counts.values()) > budget and examples:
+        examples = ""
+        counts["examples"] = 0
+        dropped_examples = 1
+
+    tokens_over = sum(counts.values()) - budget
+    if tokens_over > 0:
+        schema, dropped_columns = _fit_schema(schema, question, tokens_over, model)
+        counts["schema"] = count_tokens(schema, model)
+
+    total = sum(counts.values())
+    if total > budget:
+        llm_logger.warning(f"Prompt exceeds token budget ({total} > {budget}) after trimming.")
+
+    prompt = f"{PROMPT_RULES}\nSchema:\n{schema}\n{question_section}{examples}"
+    breakdown = {
+        **counts,
+        "total": total,
+        "budget": budget,
+        "dropped_examples": dropped_examples,
+        "dropped_columns": dropped_columns,
+    }
+    llm_logger.info(f"Prompt token breakdown: {breakdown}")
+    return prompt, breakdown
@@ -0,0 +1,136 @@
+import re
+from collections import OrderedDict
+from loguru import logger
+from core.config import settings
+from db.schema_extractor.schema_extractor import render_schema
+from llm.tokens import count_tokens
+
+llm_logger = logger.bind(llm=True)
+
+# Business words -> schema vocabulary (stemmed table/column name tokens)
+SYNONYMS = {
+    "customer": ["user"],
+    "client": ["user"],
+    "buyer": ["user"],
+    "people": ["user"],
+    "person": ["user"],
+    "member": ["user"],
+    "signup": ["user"],
+    "register": ["user"],
+    "registered": ["user"],
+    "revenue": ["order", "amount", "price", "total"],
+    "sale": ["order", "item"],
+    "sold": ["order", "item"],
+    "sell": ["order", "item"],
+    "purchase": ["order"],
+    "bought": ["order"],
+    "spent": ["order", "amount", "total"],
+    "spend": ["order", "amount", "total"],
+    "rating": ["review"],
+    "rated": ["review"],
+    "stock": ["inventory", "stock"],
+    "shipment": ["shipping"],
+    "shipped": ["shipping"],
+    "delivery": ["shipping"],
+    "delivered": ["shipping"],
+    "discount": ["coupon"],
+    "promo": ["coupon"],
+    "paid": ["payment"],
+    "pay": ["payment"],
+    "refund": ["payment"],
+}
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _tokens(text: str) -> set:
+    return {_stem(word) for word in re.split(r"[^a-z0-9]+", text.lower()) if word}
+
+
+def _question_terms(question: str) -> set:
+    terms = set()
+    for token in _tokens(question):
+        terms.add(token)
+        terms.update(SYNONYMS.get(token, []))
+    return terms
+
+
+def _fk_graph(tables):
+    references = {name: set() for name in tables}
+    referenced_by = {name: set() for name in tables}
+    for name, table in tables.items():
+        for fk in table["foreign_keys"]:
+            if fk["ref_table"] in tables and fk["ref_table"] != name:
+                references[name].add(fk["ref_table"])
+                referenced_by[fk["ref_table"]].add(name)
+    return references, referenced_by
+
+
+def select_relevant_tables(question: str, tables, fk_depth: int = None) -> list:
+    """
+    Pick the tables a question needs.
+    - Seed with tables whose name, or a distinctive column name, matches the question
+    - Expand along foreign keys in both directions up to `fk_depth` hops
+    - Add the tables referenced by the selection so joins can resolve
+    """
+    fk_depth = settings.SCHEMA_PRUNE_FK_DEPTH if fk_depth is None else fk_depth
+    terms = _question_terms(question)
+
+    column_frequency = {}
+    column_index = {}
+    for name, table in tables.items():
+        for token in {t for column in table["columns"] for t in _tokens(column["name"])}:
+            column_frequency[token] = column_frequency.get(token, 0) + 1
+            column_index.setdefault(token, set()).add(name)
+
+    # Column tokens shared by many tables (id, name, created_at...) say nothing about relevance
+    distinctive_limit = max(2, len(tables) // 4)
+    seeds = {name for name in tables if _tokens(name) & terms}
+    for token in terms:
+        if column_frequency.get(token, 0) <= distinctive_limit:
+            seeds.update(column_index.get(token, ()))
+
+    if not seeds:
+        return []
+
+    references, referenced_by = _fk_graph(tables)
+    selected = set(seeds)
+    frontier = set(seeds)
+    for _ in range(fk_depth):
+        frontier = {n for t in frontier for n in references[t] | referenced_by[t]} - selected
+        selected |= frontier
+
+    selected |= {ref for t in list(selected) for ref in references[t]}
+
+    return [name for name in tables if name in selected]
+
+
+def prune_schema(question: str, tables):
+    relevant = select_relevant_tables(question, tables)
+    if not relevant:
+        return tables
+    return OrderedDict((name, tables[name]) for name in relevant)
+
+
+def build_schema_context(question: str, tables, full_schema: str):
+    """Return the schema text to send to the LLM and its token savings."""
+    schema_context = full_schema
+    if settings.SCHEMA_PRUNING_ENABLED and tables:
+        pruned = prune_schema(question, tables)
+        if len(pruned) < len(tables):
+            schema_context = render_schema(pruned)
+            llm_logger.info(f"Pruned schema to {len(pruned)}/{len(tables)} tables: {list(pruned)}")
+
+    full_tokens = count_tokens(full_schema)
+    sent_tokens = count_tokens(schema_context)
+    return schema_context, {
+        "schema_tokens_full": full_tokens,
+        "schema_tokens_sent": sent_tokens,
+        "schema_tokens_saved": full_tokens - sent_tokens,
+    }
@@ -0,0 +1,29 @@
+from functools import lru_cache
+import tiktoken
+from loguru import logger
+from core.config import settings
+
+llm_logger = logger.bind(llm=True)
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    try:
+        encoding_name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        encoding_name = "cl100k_base"
+
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; offline hosts fall back to an estimate
+        llm_logger.warning(f"tiktoken encoding unavailable for {model}, estimating token counts: {e}")
+        return None
+
+def count_tokens(text: str, model: str = None) -> int:
+    if not text:
+        return 0
+    model = model or settings.LLM_MODEL
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text))
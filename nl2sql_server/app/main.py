@@ -1,17 +1,41 @@
 
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from api.v1.endpoints import query
+from brotli_asgi import BrotliMiddleware
+from api.v1.endpoints import query, stats
 from core.logger import setup_logging
+from llm.client import close_openai_clients
+from utils.semantic_cache import semantic_cache
+from core.config import settings
 
 setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the persisted semantic cache before serving, not inside the first request
+    if settings.SEMANTIC_CACHE_ENABLED:
+        await asyncio.get_running_loop().run_in_executor(None, semantic_cache.load)
+    yield
+    await close_openai_clients()
+
 app = FastAPI(
     title="NL2SQL Server",
     description="Convert Natural Language to SQL Queries",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+# Brotli or gzip, whichever the client accepts, for responses above the size threshold
+app.add_middleware(
+    BrotliMiddleware,
+    quality=settings.RESPONSE_BROTLI_QUALITY,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+    gzip_fallback=True
 )
 
 app.include_router(query.router, prefix="/v1")
+app.include_router(stats.router, prefix="/v1")
 
 @app.get("/")
 async def root():
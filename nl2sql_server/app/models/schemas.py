@@ -1,12 +1,21 @@
-from pydantic import BaseModel
-from typing import List, Any, Optional, Dict 
+from pydantic import BaseModel, Field
+from typing import List, Any, Optional, Dict, Literal
 
 class QueryRequest(BaseModel):
     question: str
     allow_modifications: bool = False
+    page_size: Optional[int] = Field(None, ge=1, le=10000)
+    cursor: Optional[str] = None  # next_cursor of the previous page, the question is then ignored
+    formats: List[Literal["json", "table", "columnar"]] = Field(["json", "table"], min_length=1)  # Representations to return
 
 class QueryResponse(BaseModel):
     sql_query: str
-    table: str
-    results: List[Any]
+    table: Optional[str] = None  # Only when "table" is in the request's formats
+    results: Optional[List[Any]] = None  # Only when "json" is in the request's formats
+    columns: Optional[List[str]] = None  # Only when "columnar" is in the request's formats,
+    data: Optional[List[List[Any]]] = None  # with data[i] holding the values of columns[i]
     token_usage: Optional[Dict[str, int]] = None 
+    params: Optional[Dict[str, Any]] = None
+    plan: Optional[Dict[str, Any]] = None
+    stale: bool = False
+    next_cursor: Optional[str] = None
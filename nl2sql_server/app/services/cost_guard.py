@@ -0,0 +1,92 @@
+import json
+from sqlalchemy import text
+from loguru import logger
+from core.config import settings
+from services.validator import sanitize_sql_for_validation
+from utils.cache import get_cache, set_cache, make_hash_key
+
+COST_GUARD_PREFIX = "cost-guard:"
+
+# Statements PostgreSQL can EXPLAIN, DDL such as DROP/ALTER/TRUNCATE/CREATE INDEX can't be planned
+EXPLAINABLE = ("select", "with", "insert", "update", "delete", "values")
+
+
+def _walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def summarize_plan(plan) -> dict:
+    """Planner estimates from EXPLAIN (FORMAT JSON) output."""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    return {
+        "total_cost": root["Total Cost"],
+        "plan_rows": root["Plan Rows"],
+        "node_type": root["Node Type"],
+        "seq_scans": sorted({
+            node["Relation Name"] for node in _walk(root)
+            if node["Node Type"] == "Seq Scan" and "Relation Name" in node
+        }),
+    }
+
+
+def explain(db, sql: str, params: dict = None) -> dict:
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params or {}).scalar()
+    return summarize_plan(plan)
+
+
+def _over_limits(summary: dict) -> bool:
+    return (
+        summary["total_cost"] > settings.COST_GUARD_MAX_COST
+        or summary["plan_rows"] > settings.COST_GUARD_MAX_ROWS
+    )
+
+
+def check_query_cost(db, sql: str, params: dict = None, allow_limit: bool = True):
+    """
+    Pre-flight EXPLAIN of `sql`, returning (sql to run, plan summary).
+    - Over the limits, a SELECT is wrapped in a LIMIT when COST_GUARD_ACTION is "limit",
+      `allow_limit` is set and that brings the estimate under the limits; otherwise the
+      statement is rejected. Streams and exports pass allow_limit=False, a truncated
+      export would look complete
+    - Decisions are cached per SQL hash, so repeats don't reach the planner
+    - Only PostgreSQL and statements EXPLAIN accepts are checked, others return (sql, None)
+    """
+    if db.bind.dialect.name != "postgresql":
+        return sql, None
+
+    original_sql = sql
+    sql = sanitize_sql_for_validation(sql).rstrip(";").strip()
+    if not sql.lower().startswith(EXPLAINABLE):
+        return original_sql, None
+    key = COST_GUARD_PREFIX + make_hash_key(sql + json.dumps(params, sort_keys=True, default=str))
+    decision = get_cache(key)
+    if decision is None:
+        summary = explain(db, sql, params)
+        decision = {"sql": sql, "plan": {**summary, "action": "allowed"}}
+        if _over_limits(summary):
+            decision["plan"]["action"] = "rejected"
+            if settings.COST_GUARD_ACTION == "limit" and sql.lower().startswith(("select", "with")):
+                limited_sql = f"SELECT * FROM ({sql}) AS cost_guarded LIMIT {settings.COST_GUARD_LIMIT_ROWS}"
+                limited = explain(db, limited_sql, params)
+                if not _over_limits(limited):
+                    decision = {
+                        "sql": limited_sql,
+                        "plan": {**limited, "action": "limited", "original": summary},
+                    }
+        set_cache(key, decision, expire=settings.COST_GUARD_CACHE_TTL)
+        logger.info(f"Cost guard plan: {decision['plan']}")
+
+    plan = decision["plan"]
+    if plan["action"] == "limited" and not allow_limit:
+        plan = {**plan["original"], "action": "rejected"}
+    if plan["action"] == "rejected":
+        raise ValueError(
+            f"Query rejected by the cost guard: estimated cost {plan['total_cost']:.0f} "
+            f"and {plan['plan_rows']} rows exceed the limits "
+            f"({settings.COST_GUARD_MAX_COST:.0f} cost, {settings.COST_GUARD_MAX_ROWS} rows)."
+        )
+    return decision["sql"], plan
@@ -0,0 +1,170 @@
+import os
+import pickle
+import re
+import secrets
+import time
+from loguru import logger
+from core.config import settings
+from db.sql_executor.sql_executor import execute_query, stream_query
+from services.sql_tables import extract_tables, STRING_LITERAL
+from services.validator import sanitize_sql_for_validation
+from utils.cache import get_cache, set_cache
+from utils.formatter import to_json_value
+
+CURSOR_PREFIX = "page-cursor:"
+SPILL_PREFIX = "page-spill:"
+
+# Wrapping these in a keyset query would change the result or lose the key columns
+ORDER_SENSITIVE = re.compile(
+    r"\b(?:ORDER\s+BY|LIMIT|OFFSET|FETCH|GROUP\s+BY|DISTINCT|UNION|INTERSECT|EXCEPT)\b",
+    re.IGNORECASE,
+)
+
+
+def keyset_columns(sql: str, tables) -> list:
+    """
+    Primary key to page `sql` by, or None if it can't be paged with a keyset.
+    - Needs a single-table query without its own ordering, limits or aggregation
+    """
+    stripped = STRING_LITERAL.sub("''", sanitize_sql_for_validation(sql))
+    if ORDER_SENSITIVE.search(stripped):
+        return None
+    referenced = extract_tables(sql)
+    if len(referenced) != 1 or not tables:
+        return None
+    name = next(iter(referenced))
+    for table_name, table in tables.items():
+        if table_name.lower() == name and table["primary_key"]:
+            return list(table["primary_key"])
+    return None
+
+
+def keyset_sql(sql: str, key_columns: list, after: bool) -> str:
+    inner = sanitize_sql_for_validation(sql).rstrip(";").strip()
+    keys = ", ".join(f'"{column}"' for column in key_columns)
+    where = ""
+    if after:
+        bounds = ", ".join(f":page_key{i}" for i in range(len(key_columns)))
+        where = f" WHERE ({keys}) > ({bounds})" if len(key_columns) > 1 else f" WHERE {keys} > {bounds}"
+    return f"SELECT * FROM ({inner}) AS page_source{where} ORDER BY {keys} LIMIT :page_limit"
+
+
+def _save_cursor(state: dict) -> str:
+    token = secrets.token_urlsafe(16)
+    set_cache(CURSOR_PREFIX + token, state, expire=settings.PAGINATION_CURSOR_TTL)
+    return token
+
+
+def _keyset_page(db, state: dict):
+    params = {**(state["params"] or {}), "page_limit": state["page_size"] + 1}
+    last_key = state.get("last_key")
+    if last_key is not None:
+        params.update({f"page_key{i}": value for i, value in enumerate(last_key)})
+
+    rows, columns = execute_query(db, keyset_sql(state["sql_query"], state["key_columns"], last_key is not None), params)
+    columns = list(columns)
+    next_cursor = None
+    if len(rows) > state["page_size"]:
+        rows = rows[:state["page_size"]]
+        positions = [columns.index(column) for column in state["key_columns"]]
+        last_key = [to_json_value(rows[-1][position]) for position in positions]
+        next_cursor = _save_cursor({**state, "last_key": last_key})
+    return rows, columns, next_cursor
+
+
+def _sweep_spill_files():
+    # Spill files outlive their cursors only until the next spill
+    cutoff = time.time() - settings.PAGINATION_CURSOR_TTL
+    for entry in os.scandir(settings.PAGINATION_SPILL_DIR):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+
+
+def _spill(db, state: dict):
+    """
+    Write the full result to disk once, one pickled page of rows at a time, noting the byte
+    offset each page starts at. Rows keep their database types, so spilled pages are
+    formatted exactly like keyset pages.
+    """
+    os.makedirs(settings.PAGINATION_SPILL_DIR, exist_ok=True)
+    _sweep_spill_files()
+
+    page_size = state["page_size"]
+    spill_id = secrets.token_urlsafe(16)
+    path = os.path.join(settings.PAGINATION_SPILL_DIR, f"{spill_id}.pickle")
+    columns, batches = stream_query(db, state["sql_query"], state["params"])
+    first_page, page, offsets, count = None, [], [], 0
+    with open(path, "wb") as spill_file:
+        for batch in batches:
+            for row in batch:
+                page.append(tuple(row))
+                count += 1
+                if len(page) == page_size:
+                    first_page = _write_spill_page(spill_file, page, offsets, first_page)
+                    page = []
+        if page or not offsets:
+            first_page = _write_spill_page(spill_file, page, offsets, first_page)
+    logger.info(f"Spilled {count} rows into {len(offsets)} pages at {path}.")
+
+    if len(offsets) <= 1:
+        os.remove(path)
+        return first_page, columns, None
+
+    set_cache(
+        SPILL_PREFIX + spill_id,
+        {"path": path, "offsets": offsets, "columns": list(columns)},
+        expire=settings.PAGINATION_CURSOR_TTL
+    )
+    return first_page, columns, _save_cursor({**state, "spill_id": spill_id, "page": 1})
+
+
+def _write_spill_page(spill_file, page: list, offsets: list, first_page):
+    offsets.append(spill_file.tell())
+    pickle.dump(page, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+    return page if first_page is None else first_page
+
+
+def _spill_page(state: dict):
+    spill = get_cache(SPILL_PREFIX + state["spill_id"])
+    if spill is None or not os.path.exists(spill["path"]):
+        raise ValueError("Cursor is invalid or has expired.")
+
+    page = state["page"]
+    with open(spill["path"], "rb") as spill_file:
+        spill_file.seek(spill["offsets"][page])
+        rows = pickle.load(spill_file)
+
+    next_cursor = None
+    if page + 1 < len(spill["offsets"]):
+        next_cursor = _save_cursor({**state, "page": page + 1})
+    return rows, spill["columns"], next_cursor
+
+
+def first_page(db, sql_query: str, params: dict, page_size: int, tables):
+    """
+    Return (rows, columns, next_cursor) for the first `page_size` rows of `sql_query`.
+    - Keyset pagination on the table's primary key when the query allows it
+    - Otherwise the result is spilled to a file so later pages are read by offset
+    """
+    state = {"sql_query": sql_query, "params": params, "page_size": page_size}
+    key_columns = keyset_columns(sql_query, tables)
+    if key_columns:
+        try:
+            return _keyset_page(db, {**state, "mode": "keyset", "key_columns": key_columns})
+        except Exception as e:
+            # e.g. the key columns aren't in the select list
+            logger.info(f"Keyset pagination not possible, spilling instead: {str(e)}")
+            db.rollback()
+    return _spill(db, {**state, "mode": "spill"})
+
+
+def next_page(db, cursor: str):
+    """Return (rows, columns, next_cursor, state) for the page a cursor points at."""
+    state = get_cache(CURSOR_PREFIX + cursor)
+    if state is None:
+        raise ValueError("Cursor is invalid or has expired.")
+    if state["mode"] == "keyset":
+        rows, columns, next_cursor = _keyset_page(db, state)
+    else:
+        rows, columns, next_cursor = _spill_page(state)
+    return rows, columns, next_cursor, state
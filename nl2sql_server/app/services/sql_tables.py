@@ -0,0 +1,38 @@
+import re
+from services.validator import sanitize_sql_for_validation
+
+IDENTIFIER = r'(?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?(?![\w"])'
+
+# Keywords that are followed by one table name
+TABLE_AFTER_KEYWORD = re.compile(
+    rf'\b(?:JOIN|UPDATE|INTO|TABLE|TRUNCATE)\s+(?:ONLY\s+)?(?:IF\s+EXISTS\s+)?({IDENTIFIER})',
+    re.IGNORECASE,
+)
+# FROM may be followed by a comma separated list: FROM a, b AS x, c y
+FROM_LIST = re.compile(
+    rf'\bFROM\s+((?:ONLY\s+)?{IDENTIFIER}(?!\s*\()(?:\s+(?:AS\s+)?\w+)?(?:\s*,\s*{IDENTIFIER}(?:\s+(?:AS\s+)?\w+)?)*)',
+    re.IGNORECASE,
+)
+CTE_NAME = re.compile(r'(?:\bWITH(?:\s+RECURSIVE)?|,)\s*(\w+)\s+AS\s*\(', re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# Functions that use FROM inside their argument list, e.g. EXTRACT(MONTH FROM created_at)
+FROM_IN_FUNCTION = re.compile(r'\b(?:EXTRACT|SUBSTRING|TRIM|OVERLAY|POSITION)\s*\([^()]*\)', re.IGNORECASE)
+
+
+def _table_name(identifier: str) -> str:
+    return identifier.split(".")[-1].strip('"').lower()
+
+
+def extract_tables(sql: str) -> set:
+    """Best-effort set of table names a statement reads or writes (CTE names excluded)."""
+    sql = STRING_LITERAL.sub("''", sanitize_sql_for_validation(sql))
+    sql = FROM_IN_FUNCTION.sub("NULL", sql)
+    tables = {_table_name(m.group(1)) for m in TABLE_AFTER_KEYWORD.finditer(sql)}
+
+    for match in FROM_LIST.finditer(sql):
+        for item in match.group(1).split(","):
+            item = re.sub(r'^\s*ONLY\s+', '', item, flags=re.IGNORECASE)
+            tables.add(_table_name(item.split()[0]))
+
+    tables -= {name.lower() for name in CTE_NAME.findall(sql)}
+    return tables
@@ -0,0 +1,182 @@
+import re
+from core.config import settings
+from services.validator import sanitize_sql_for_validation
+from utils.cache import get_cache, set_cache, make_hash_key
+
+TEMPLATE_PREFIX = "sql-template:"
+
+MONTHS = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december",
+]
+
+# Tokens of a canonical question (see utils.optimizer.canonicalize_question)
+QUESTION_TOKEN = re.compile(r"'[^']*'|\"[^\"]*\"|\S+")
+# String literals, quoted identifiers (skipped) and bare numbers of a SQL statement
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|(?<![\w.$:])\d+(?:\.\d+)?(?![\w.])")
+
+CASES = {
+    "same": lambda value: value,
+    "lower": str.lower,
+    "upper": str.upper,
+    "title": str.title,
+}
+
+
+def _question_literals(canonical_question: str):
+    """Split a canonical question into (shape, literals) with literals as (position, kind, value)."""
+    shape, literals = [], []
+    for token in QUESTION_TOKEN.findall(canonical_question):
+        if token[0] in "'\"":
+            kind = "string"
+        elif token[0].isdigit():
+            kind = "number"
+        elif token in MONTHS:
+            kind = "month"
+        else:
+            shape.append(token)
+            continue
+        shape.append(f"<{kind}>")
+        literals.append((len(literals), kind, token))
+    return " ".join(shape), literals
+
+
+def _sql_literals(sql: str):
+    """Return (start, end, kind, value) for each string or numeric literal in `sql`."""
+    found = []
+    for match in SQL_LITERAL.finditer(sql):
+        token = match.group()
+        if token[0] == '"':
+            continue
+        kind = "string" if token[0] == "'" else "number"
+        value = token[1:-1].replace("''", "'") if kind == "string" else token
+        found.append((match.start(), match.end(), kind, value))
+    return found
+
+
+def _case_of(original: str, value: str):
+    for name, apply in CASES.items():
+        if apply(original) == value:
+            return name
+    return None
+
+
+def _align(kind: str, value: str, sql_kind: str, sql_value: str):
+    """How a question literal maps onto one SQL literal, or None if it doesn't."""
+    if kind == "number" and sql_kind == "number":
+        if float(value) == float(sql_value):
+            return {"kind": "number", "integer": "." not in sql_value}
+    elif kind == "month" and sql_kind == "number":
+        if float(sql_value) == MONTHS.index(value) + 1:
+            return {"kind": "month_number"}
+    elif kind == "month" and sql_kind == "string":
+        case = _case_of(value, sql_value)
+        if case:
+            return {"kind": "month_name", "case": case}
+    elif kind == "string" and sql_kind == "string":
+        # LIKE patterns keep their wildcards around the bound value
+        core = sql_value.strip("%")
+        case = _case_of(value[1:-1], core)
+        if case and core:
+            prefix = sql_value[:len(sql_value) - len(sql_value.lstrip("%"))]
+            suffix = sql_value[len(sql_value.rstrip("%")):]
+            return {"kind": "string", "case": case, "prefix": prefix, "suffix": suffix}
+    return None
+
+
+def _bind(slot: dict, value: str):
+    """Value bound to `slot` for a question literal, or None if it can't take that value."""
+    kind = slot["kind"]
+    if kind == "number":
+        if "." not in value:
+            return int(value)
+        return None if slot["integer"] else float(value)
+    if kind == "month_number":
+        return MONTHS.index(value) + 1
+    if kind == "month_name":
+        return CASES[slot["case"]](value)
+    return slot["prefix"] + CASES[slot["case"]](value[1:-1]) + slot["suffix"]
+
+
+def _template_key(shape: str, fingerprint: str) -> str:
+    return TEMPLATE_PREFIX + make_hash_key(f"{fingerprint}\x00{shape}")
+
+
+def build_template(canonical_question: str, sql: str):
+    """
+    Turn a question/SQL pair into a template, or None if no literal can be parameterized.
+    - A question literal becomes a slot when exactly one SQL literal matches it (and no other
+      question literal matches that SQL literal)
+    - Literals that don't align stay fixed, so only questions with the same value reuse the template
+    """
+    shape, literals = _question_literals(canonical_question)
+    sql = sanitize_sql_for_validation(sql)
+    sql_literals = _sql_literals(sql)
+
+    matches = {}
+    for position, kind, value in literals:
+        matches[position] = [
+            (index, alignment)
+            for index, (_, _, sql_kind, sql_value) in enumerate(sql_literals)
+            for alignment in [_align(kind, value, sql_kind, sql_value)]
+            if alignment
+        ]
+    claimed = {}
+    for position, candidates in matches.items():
+        for index, _ in candidates:
+            claimed[index] = claimed.get(index, 0) + 1
+
+    slots, fixed, replacements = [], [], []
+    for position, kind, value in literals:
+        candidates = matches[position]
+        if len(candidates) == 1 and claimed[candidates[0][0]] == 1:
+            index, alignment = candidates[0]
+            param = f"p{len(slots)}"
+            slots.append({"position": position, "param": param, **alignment})
+            start, end, _, _ = sql_literals[index]
+            replacements.append((start, end, f":{param}"))
+        else:
+            fixed.append([position, value])
+
+    if not slots:
+        return None
+
+    for start, end, placeholder in sorted(replacements, reverse=True):
+        sql = sql[:start] + placeholder + sql[end:]
+    return {"shape": shape, "sql": sql, "slots": slots, "fixed": fixed}
+
+
+def learn_template(canonical_question: str, sql: str, fingerprint: str) -> bool:
+    """Store the template of a successfully executed SELECT, returning whether one was learned."""
+    if fingerprint is None:
+        return False
+    template = build_template(canonical_question, sql)
+    if template is None:
+        return False
+
+    key = _template_key(template["shape"], fingerprint)
+    variants = [
+        variant for variant in get_cache(key) or []
+        if (variant["slots"], variant["fixed"]) != (template["slots"], template["fixed"])
+    ]
+    variants.insert(0, {"sql": template["sql"], "slots": template["slots"], "fixed": template["fixed"]})
+    set_cache(key, variants[:settings.SQL_TEMPLATE_MAX_VARIANTS], expire=settings.SQL_TEMPLATE_TTL)
+    return True
+
+
+def match_template(canonical_question: str, fingerprint: str):
+    """Return (sql, params) from a learned template matching the question, or None."""
+    if fingerprint is None:
+        return None
+    shape, literals = _question_literals(canonical_question)
+    if not literals:
+        return None
+
+    values = [value for _, _, value in literals]
+    for variant in get_cache(_template_key(shape, fingerprint)) or []:
+        if any(values[position] != value for position, value in variant["fixed"]):
+            continue
+        params = {slot["param"]: _bind(slot, values[slot["position"]]) for slot in variant["slots"]}
+        if None not in params.values():
+            return variant["sql"], params
+    return None
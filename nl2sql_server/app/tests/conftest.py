@@ -1,5 +1,8 @@
 import logging
 import pytest
+from diskcache import Cache
+from utils import cache as cache_module
+from utils.cache import MemoryTier
 
 @pytest.fixture(autouse=True)
 def configure_logging():
@@ -11,3 +14,18 @@ def configure_logging():
             logging.StreamHandler()
         ]
     )
+
+@pytest.fixture
+def isolated_cache(request, tmp_path, monkeypatch):
+    """
+    Point both cache tiers at a fresh tmp diskcache and an empty MemoryTier; yields the disk tier.
+    - MemoryTier limits default to 100 entries / 1 MiB; override them with indirect
+      parametrization, e.g. parametrize("isolated_cache", [{"max_entries": 3}], indirect=True)
+    """
+    limits = {"max_entries": 100, "max_bytes": 1024 * 1024, **getattr(request, "param", {})}
+    disk = Cache(str(tmp_path / "cache"))
+    monkeypatch.setattr(cache_module, "cache", disk)
+    monkeypatch.setattr(cache_module, "memory_cache", MemoryTier(**limits))
+    monkeypatch.setattr(cache_module, "disk_stats", {"hits": 0, "misses": 0})
+    yield disk
+    disk.close()
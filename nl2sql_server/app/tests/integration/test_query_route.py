@@ -3,22 +3,35 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 from unittest.mock import AsyncMock
 from main import app 
+from utils.singleflight import llm_flight, result_flight
+import asyncio
+import httpx
 import json
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def result_cache_miss():
+    # Keep route tests off the on-disk result and template caches unless a test patches them itself
+    with patch("api.v1.endpoints.query.get_swr_cache", return_value=(None, False)), \
+         patch("api.v1.endpoints.query.set_swr_cache"), \
+         patch("api.v1.endpoints.query.tag_cache_key"), \
+         patch("api.v1.endpoints.query.match_template", return_value=None), \
+         patch("api.v1.endpoints.query.learn_template", return_value=False):
+        yield
+
 # -------------------------------
 #  SUCCESS: Valid SELECT Query
 # -------------------------------
-@patch("app.api.v1.endpoints.query.set_cache")
-@patch("app.api.v1.endpoints.query.get_cache")
-@patch("app.api.v1.endpoints.query.execute_query")
-@patch("app.api.v1.endpoints.query.validate_sql")
-@patch("app.api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
-@patch("app.api.v1.endpoints.query.extract_schema")
-@patch("app.api.v1.endpoints.query.get_db")
+@patch("api.v1.endpoints.query.set_cache")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.validate_sql")
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
 def test_generate_and_execute_query_success(
     mock_get_db,
-    mock_extract_schema,
+    mock_get_schema,
     mock_generate_sql,
     mock_validate_sql,
     mock_execute_query,
@@ -28,7 +41,7 @@ def test_generate_and_execute_query_success(
     mock_db = MagicMock()
     mock_get_db.return_value.__enter__.return_value = mock_db
 
-    mock_extract_schema.return_value = {"tables": {"users": ["id", "name", "email"]}}
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n  - name (TEXT)\n  - email (TEXT)\n"
 
     mock_generate_sql.return_value = {
         "sql": "SELECT COUNT(*) FROM users;",
@@ -56,20 +69,20 @@ def test_generate_and_execute_query_success(
 # --------------------------------------
 #  ERROR: Unsafe SQL Query Blocked
 # --------------------------------------
-@patch("app.api.v1.endpoints.query.get_db")
-@patch("app.api.v1.endpoints.query.extract_schema")
-@patch("app.api.v1.endpoints.query.generate_sql")
-@patch("app.api.v1.endpoints.query.validate_sql")
+@patch("api.v1.endpoints.query.get_db")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.generate_sql")
+@patch("api.v1.endpoints.query.validate_sql")
 def test_generate_and_execute_query_invalid_sql(
     mock_validate_sql,
     mock_generate_sql,
-    mock_extract_schema,
+    mock_get_schema,
     mock_get_db,
 ):
     mock_db = MagicMock()
     mock_get_db.return_value.__enter__.return_value = mock_db
 
-    mock_extract_schema.return_value = {"tables": {"users": ["id", "name"]}}
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n  - name (TEXT)\n"
     mock_generate_sql.return_value = {"sql": "DROP TABLE users;", "token_usage": {}}
     mock_validate_sql.return_value = False
 
@@ -85,27 +98,27 @@ def test_generate_and_execute_query_invalid_sql(
 # ----------------------------
 #  CACHE HIT for LLM Output
 # ----------------------------
-@patch("app.api.v1.endpoints.query.get_db")
-@patch("app.api.v1.endpoints.query.extract_schema")
-@patch("app.api.v1.endpoints.query.get_cache")
-@patch("app.api.v1.endpoints.query.validate_sql")
-@patch("app.api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_db")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.validate_sql")
+@patch("api.v1.endpoints.query.execute_query")
 def test_generate_query_with_llm_cache_hit(
     mock_execute_query,
     mock_validate_sql,
     mock_get_cache,
-    mock_extract_schema,
+    mock_get_schema,
     mock_get_db,
 ):
     mock_db = MagicMock()
     mock_get_db.return_value.__enter__.return_value = mock_db
 
-    mock_extract_schema.return_value = {"tables": {"products": ["id", "name"]}}
+    mock_get_schema.return_value = "Table products:\n  - id (TEXT)\n  - name (TEXT)\n"
     cached_llm = {
         "sql": "SELECT * FROM products;",
         "token_usage": {"prompt_tokens": 5, "completion_tokens": 10}
     }
-    mock_get_cache.side_effect = [json.dumps(cached_llm), None]  # LLM hit, result miss
+    mock_get_cache.return_value = cached_llm  # LLM hit, result miss
 
     mock_validate_sql.return_value = True
     mock_execute_query.return_value = ([("4K TV",)], ["name"])
@@ -124,23 +137,23 @@ def test_generate_query_with_llm_cache_hit(
 # ----------------------------
 #  Non-SELECT Query (e.g. UPDATE)
 # ----------------------------
-@patch("app.api.v1.endpoints.query.get_db")
-@patch("app.api.v1.endpoints.query.extract_schema")
-@patch("app.api.v1.endpoints.query.generate_sql")
-@patch("app.api.v1.endpoints.query.validate_sql")
-@patch("app.api.v1.endpoints.query.execute_query")
-@patch("app.api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.get_db")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.generate_sql")
+@patch("api.v1.endpoints.query.validate_sql")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_cache")
 def test_generate_and_execute_update_query(
     mock_get_cache,
     mock_execute_query,
     mock_validate_sql,
     mock_generate_sql,
-    mock_extract_schema,
+    mock_get_schema,
     mock_get_db,
 ):
     mock_db = MagicMock()
     mock_get_db.return_value.__enter__.return_value = mock_db
-    mock_extract_schema.return_value = {"tables": {"users": ["id", "name"]}}
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n  - name (TEXT)\n"
 
     mock_generate_sql.return_value = {
         "sql": "UPDATE users SET name='John' WHERE id=1;",
@@ -159,3 +172,528 @@ def test_generate_and_execute_update_query(
     assert response.status_code == 200
     assert response.json()["sql_query"].startswith("UPDATE users")
 
+
+
+# ----------------------------------------------
+#  Concurrent identical questions share one LLM call
+# ----------------------------------------------
+@pytest.mark.asyncio
+@patch("api.v1.endpoints.query.set_cache")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+async def test_concurrent_duplicate_questions_are_coalesced(
+    mock_get_db,
+    mock_get_schema,
+    mock_generate_sql,
+    mock_execute_query,
+    mock_get_cache,
+    mock_set_cache
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = None
+    mock_execute_query.return_value = ([(3,)], ["count"])
+
+    async def slow_generate(*args, **kwargs):
+        await asyncio.sleep(0.1)
+        return {"sql": "SELECT COUNT(*) FROM users;", "token_usage": {"total_tokens": 5}}
+    mock_generate_sql.side_effect = slow_generate
+
+    llm_coalesced = llm_flight.coalesced
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+        responses = await asyncio.gather(*[
+            async_client.post("/v1/query", json={"question": "How many users?"})
+            for _ in range(5)
+        ])
+
+    assert all(response.status_code == 200 for response in responses)
+    assert mock_generate_sql.await_count == 1
+    assert mock_execute_query.call_count == 1
+    assert llm_flight.coalesced - llm_coalesced == 4
+    assert result_flight.stats()["in_flight"] == 0
+
+
+# ----------------------------------------------
+#  Writes invalidate cached results of the tables they touch
+# ----------------------------------------------
+@patch("api.v1.endpoints.query.invalidate_tables")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.validate_sql")
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_modification_invalidates_table_results(
+    mock_get_db,
+    mock_get_schema,
+    mock_generate_sql,
+    mock_validate_sql,
+    mock_execute_query,
+    mock_get_cache,
+    mock_invalidate_tables
+):
+    mock_db = MagicMock()
+    mock_get_db.return_value.__enter__.return_value = mock_db
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_generate_sql.return_value = {"sql": "DELETE FROM users WHERE id=1;", "token_usage": {}}
+    mock_validate_sql.return_value = True
+    mock_get_cache.return_value = None
+    mock_execute_query.return_value = ([], [])
+    mock_invalidate_tables.return_value = 2
+
+    response = client.post("/v1/query", json={
+        "question": "Delete user 1",
+        "allow_modifications": True
+    })
+
+    assert response.status_code == 200
+    mock_db.commit.assert_called_once()
+    mock_invalidate_tables.assert_called_once_with({"users"})
+
+
+# ----------------------------------------------
+#  Stale result served immediately and refreshed in the background
+# ----------------------------------------------
+@patch("api.v1.endpoints.query.schedule_refresh")
+@patch("api.v1.endpoints.query.get_swr_cache")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_stale_result_served_and_refreshed(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    mock_get_swr_cache,
+    mock_schedule_refresh
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT COUNT(*) FROM users;", "token_usage": {}}
+    mock_get_swr_cache.return_value = ({"table": "", "json": [{"count": 41}]}, True)
+
+    response = client.post("/v1/query", json={"question": "How many users?"})
+
+    assert response.status_code == 200
+    assert response.json()["stale"] is True
+    assert response.json()["results"] == [{"count": 41}]
+    mock_execute_query.assert_not_called()
+    mock_schedule_refresh.assert_called_once()
+
+
+# --------------------------------------
+#  SUCCESS: Only Requested Formats Returned
+# --------------------------------------
+@patch("utils.formatter.tabulate")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_json_only_skips_table(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    mock_tabulate
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT name FROM users;", "token_usage": {}}
+    mock_execute_query.return_value = ([("John",)], ["name"])
+
+    response = client.post("/v1/query", json={"question": "user names", "formats": ["json"]})
+
+    assert response.status_code == 200
+    assert response.json()["table"] is None
+    assert response.json()["results"] == [{"name": "John"}]
+    mock_tabulate.assert_not_called()
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_large_responses_are_compressed(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    encoding
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT name FROM users;", "token_usage": {}}
+    mock_execute_query.return_value = ([(f"user {i}",) for i in range(2000)], ["name"])
+
+    response = client.post(
+        "/v1/query", json={"question": "user names"}, headers={"Accept-Encoding": encoding}
+    )
+    small = client.get("/", headers={"Accept-Encoding": encoding})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.json()["results"][1999] == {"name": "user 1999"}
+    assert "content-encoding" not in small.headers
+
+
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_columnar_results(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT user_id, name FROM users;", "token_usage": {}}
+    mock_execute_query.return_value = ([(1, "John"), (2, "Jane")], ["user_id", "name"])
+
+    response = client.post("/v1/query", json={"question": "user names", "formats": ["columnar"]})
+
+    assert response.status_code == 200
+    assert response.json()["results"] is None
+    assert response.json()["columns"] == ["user_id", "name"]
+    assert response.json()["data"] == [[1, 2], ["John", "Jane"]]
+
+
+# --------------------------------------
+#  SUCCESS: Learned Template Skips the LLM
+# --------------------------------------
+@patch("api.v1.endpoints.query.match_template")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_template_match_binds_params_without_llm(
+    mock_get_db,
+    mock_get_schema,
+    mock_generate_sql,
+    mock_execute_query,
+    mock_get_cache,
+    mock_match_template
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table orders:\n  - user_id (INTEGER)\n"
+    mock_get_cache.return_value = None
+    mock_match_template.return_value = ("SELECT * FROM orders WHERE user_id = :p0;", {"p0": 43})
+    mock_execute_query.return_value = ([(7, 43)], ["order_id", "user_id"])
+
+    response = client.post("/v1/query", json={"question": "orders for user 43"})
+
+    assert response.status_code == 200
+    assert response.json()["sql_query"] == "SELECT * FROM orders WHERE user_id = :p0;"
+    assert response.json()["params"] == {"p0": 43}
+    mock_generate_sql.assert_not_called()
+    assert mock_execute_query.call_args.args[1:] == ("SELECT * FROM orders WHERE user_id = :p0;", {"p0": 43})
+
+
+# --------------------------------------
+#  STREAMING: NDJSON / CSV Export
+# --------------------------------------
+@pytest.fixture
+def orders_db(tmp_path):
+    from contextlib import contextmanager
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'stream.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE orders (order_id INTEGER PRIMARY KEY, total NUMERIC, note TEXT)"))
+        conn.execute(text("INSERT INTO orders (total, note) VALUES " + ", ".join(
+            f"({i * 1.5}, 'order {i}')" for i in range(1, 2501)
+        )))
+    SessionLocal = sessionmaker(bind=engine)
+
+    @contextmanager
+    def real_get_db(read_only=False):
+        with SessionLocal() as session:
+            yield session
+
+    with patch("api.v1.endpoints.query.get_db", real_get_db), \
+         patch("api.v1.endpoints.query.get_schema", return_value={"orders": ["order_id", "total", "note"]}), \
+         patch("api.v1.endpoints.query.get_cache", return_value=None), \
+         patch("api.v1.endpoints.query.set_cache"):
+        yield engine
+    engine.dispose()
+
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_stream_ndjson_sends_header_then_rows(mock_generate_sql, orders_db):
+    mock_generate_sql.return_value = {
+        "sql": "SELECT order_id, total, note FROM orders ORDER BY order_id;",
+        "token_usage": {"prompt_tokens": 10}
+    }
+
+    response = client.post("/v1/query/stream", json={"question": "export all orders"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    header = lines[0]
+    assert header["sql_query"] == "SELECT order_id, total, note FROM orders ORDER BY order_id;"
+    assert header["params"] is None
+    assert header["columns"] == ["order_id", "total", "note"]
+    assert header["token_usage"]["prompt_tokens"] == 10
+    assert len(lines) == 1 + 2500
+    assert lines[1] == {"order_id": 1, "total": 1.5, "note": "order 1"}
+    assert lines[-1]["order_id"] == 2500
+
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_stream_csv(mock_generate_sql, orders_db):
+    mock_generate_sql.return_value = {"sql": "SELECT order_id, note FROM orders\nORDER BY order_id;", "token_usage": {}}
+
+    response = client.post("/v1/query/stream?format=csv", json={"question": "export all orders"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["x-sql-query"] == "SELECT order_id, note FROM orders ORDER BY order_id;"
+    lines = response.text.splitlines()
+    assert lines[:3] == ["order_id,note", "1,order 1", "2,order 2"]
+    assert len(lines) == 1 + 2500
+
+@pytest.mark.parametrize("sql, detail", [
+    ("UPDATE orders SET note = 'x';", "Only SELECT queries can be streamed."),
+    ("SELECT missing_column FROM orders;", "no such column"),
+])
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_stream_errors_before_first_byte(mock_generate_sql, orders_db, sql, detail):
+    mock_generate_sql.return_value = {"sql": sql, "token_usage": {}}
+
+    response = client.post(
+        "/v1/query/stream", json={"question": "export all orders", "allow_modifications": True}
+    )
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+@pytest.mark.parametrize("path", ["/v1/query/stream", "/v1/query/export"])
+@patch("api.v1.endpoints.query.check_query_cost")
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_downloads_refuse_the_cost_guard_limit(mock_generate_sql, mock_check_query_cost, orders_db, path):
+    mock_generate_sql.return_value = {"sql": "SELECT * FROM orders;", "token_usage": {}}
+    mock_check_query_cost.side_effect = ValueError("Query rejected by the cost guard")
+
+    response = client.post(path, json={"question": "export all orders"})
+
+    assert response.status_code == 400
+    assert mock_check_query_cost.call_args.args[-1] is False
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+@patch("api.v1.endpoints.query.set_swr_bytes_cache")
+@patch("api.v1.endpoints.query.get_swr_bytes_cache", return_value=(None, False))
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_export_binary_results(mock_generate_sql, mock_get_bytes_cache, mock_set_bytes_cache, orders_db, format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    mock_generate_sql.return_value = {"sql": "SELECT order_id, note FROM orders ORDER BY order_id;", "token_usage": {}}
+
+    response = client.post(f"/v1/query/export?format={format}", json={"question": "export all orders"})
+
+    assert response.status_code == 200
+    assert response.headers["x-sql-query"] == "SELECT order_id, note FROM orders ORDER BY order_id;"
+    if format == "parquet":
+        table = pq.read_table(pa.BufferReader(response.content))
+    else:
+        assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column_names == ["order_id", "note"]
+    assert table.num_rows == 2500
+    assert table.column("order_id").to_pylist()[:2] == [1, 2]
+    assert response.headers["x-result-stale"] == "false"
+    mock_set_bytes_cache.assert_called_once()
+    assert mock_set_bytes_cache.call_args.args[1] == response.content
+
+@patch("api.v1.endpoints.query.refresh_in_background")
+@patch("api.v1.endpoints.query.get_swr_bytes_cache", return_value=(b"cached arrow", True))
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_stale_export_is_flagged_and_refreshed(mock_generate_sql, mock_get_bytes_cache, mock_refresh, orders_db):
+    mock_generate_sql.return_value = {"sql": "SELECT order_id FROM orders;", "token_usage": {}}
+
+    response = client.post("/v1/query/export", json={"question": "export all orders"})
+
+    assert response.status_code == 200
+    assert response.content == b"cached arrow"
+    assert response.headers["x-result-stale"] == "true"
+    mock_refresh.assert_called_once()
+
+@patch("api.v1.endpoints.query.generate_sql", new_callable=AsyncMock)
+def test_paginated_query_follows_cursor(mock_generate_sql, orders_db, tmp_path, monkeypatch):
+    from core.config import settings
+    monkeypatch.setattr(settings, "PAGINATION_SPILL_DIR", str(tmp_path / "spill"))
+    mock_generate_sql.return_value = {"sql": "SELECT order_id, note FROM orders ORDER BY order_id DESC;", "token_usage": {}}
+
+    first = client.post("/v1/query", json={"question": "latest orders", "page_size": 1000})
+    assert first.status_code == 200
+    assert len(first.json()["results"]) == 1000
+    assert first.json()["results"][0]["order_id"] == 2500
+
+    # The cursor alone is enough, no SQL generation for later pages
+    mock_generate_sql.reset_mock()
+    second = client.post("/v1/query", json={"question": "", "cursor": first.json()["next_cursor"]})
+    third = client.post("/v1/query", json={"question": "", "cursor": second.json()["next_cursor"]})
+
+    assert second.json()["results"][0]["order_id"] == 1500
+    assert len(third.json()["results"]) == 500
+    assert third.json()["next_cursor"] is None
+    assert second.json()["sql_query"] == "SELECT order_id, note FROM orders ORDER BY order_id DESC;"
+    mock_generate_sql.assert_not_called()
+
+    expired = client.post("/v1/query", json={"question": "", "cursor": "missing"})
+    assert expired.status_code == 400
+
+@patch("api.v1.endpoints.query.check_query_cost")
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_cost_guard_downgrade_runs_limited_sql(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    mock_check_query_cost
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table reviews:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT * FROM order_items, reviews;", "token_usage": {}}
+    limited_sql = "SELECT * FROM (SELECT * FROM order_items, reviews) AS cost_guarded LIMIT 1000"
+    plan = {"total_cost": 130.0, "plan_rows": 1000, "node_type": "Limit", "seq_scans": [], "action": "limited"}
+    mock_check_query_cost.return_value = (limited_sql, plan)
+    mock_execute_query.return_value = ([(1,)], ["id"])
+
+    response = client.post("/v1/query", json={"question": "all items with all reviews"})
+
+    assert response.status_code == 200
+    assert response.json()["sql_query"] == limited_sql
+    assert response.json()["plan"] == plan
+    assert mock_execute_query.call_args.args[1] == limited_sql
+
+@patch("api.v1.endpoints.query.check_query_cost", side_effect=ValueError("Query rejected by the cost guard"))
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_cost_guard_rejection_is_a_400(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    mock_check_query_cost
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table reviews:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": "SELECT COUNT(*) FROM order_items, reviews;", "token_usage": {}}
+
+    response = client.post("/v1/query", json={"question": "count items times reviews"})
+
+    assert response.status_code == 400
+    assert "cost guard" in response.json()["detail"]
+    mock_execute_query.assert_not_called()
+
+# --------------------------------------
+#  CANCELLATION: Client Disconnect
+# --------------------------------------
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_llm_call(monkeypatch):
+    from core.config import settings
+    monkeypatch.setattr(settings, "DISCONNECT_POLL_INTERVAL", 0.05)
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def slow_generate_sql(*args, **kwargs):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    messages = [{"type": "http.request", "body": json.dumps({"question": "slow disconnect"}).encode()}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # The browser tab closes once the LLM call is under way
+        await started.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/v1/query", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json")], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1234),
+    }
+    with patch("api.v1.endpoints.query.get_db"), \
+         patch("api.v1.endpoints.query.get_schema", return_value="Table users:\n  - id (TEXT)\n"), \
+         patch("api.v1.endpoints.query.get_cache", return_value=None), \
+         patch("api.v1.endpoints.query.generate_sql", slow_generate_sql):
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+    assert cancelled.is_set()
+    assert sent[0]["status"] == 499
+
+# --------------------------------------
+#  ROUTING: Replicas for Read-Only SQL
+# --------------------------------------
+@pytest.mark.parametrize("sql, allow_modifications, expected_read_only", [
+    ("SELECT COUNT(*) FROM users;", False, True),
+    ("SELECT COUNT(*) FROM users;", True, False),
+    ("UPDATE users SET name = 'x';", True, False),
+])
+@patch("api.v1.endpoints.query.get_cache")
+@patch("api.v1.endpoints.query.execute_query")
+@patch("api.v1.endpoints.query.get_schema")
+@patch("api.v1.endpoints.query.get_db")
+def test_statements_are_routed_by_read_only(
+    mock_get_db,
+    mock_get_schema,
+    mock_execute_query,
+    mock_get_cache,
+    sql,
+    allow_modifications,
+    expected_read_only
+):
+    mock_get_db.return_value.__enter__.return_value = MagicMock()
+    mock_get_schema.return_value = "Table users:\n  - id (TEXT)\n"
+    mock_get_cache.return_value = {"sql": sql, "token_usage": {}}
+    mock_execute_query.return_value = ([(1,)], ["count"])
+
+    response = client.post("/v1/query", json={"question": "q", "allow_modifications": allow_modifications})
+
+    assert response.status_code == 200
+    routed = [call.kwargs.get("read_only", False) for call in mock_get_db.call_args_list]
+    # Schema reflection always reads from a replica, the statement itself depends on the request
+    assert routed[0] is True
+    assert routed[-1] is expected_read_only
+
+# --------------------------------------
+#  STATS: Connection Pool Metrics
+# --------------------------------------
+def test_stats_report_pool_metrics():
+    from sqlalchemy import text
+    from core.config import settings
+    from db.schema_extractor.session import get_db
+
+    with get_db() as db:
+        db.execute(text("SELECT 1"))
+
+    response = client.get("/v1/stats")
+
+    assert response.status_code == 200
+    primary = response.json()["db_pools"]["primary"]
+    assert primary["checkouts"] >= 1
+    assert primary["size"] == settings.DB_POOL_SIZE
+    assert set(primary["checkout_wait_ms"]) == {"count", "mean", "max", "p50", "p95", "p99", "buckets"}
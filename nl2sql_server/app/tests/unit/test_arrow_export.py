@@ -0,0 +1,54 @@
+import pytest
+import logging
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime, timedelta
+from decimal import Decimal
+from utils.arrow_export import results_to_arrow, encode_results
+
+logger = logging.getLogger(__name__)
+
+ROWS = [
+    (1, Decimal("9.50"), datetime(2024, 3, 1, 12, 30), timedelta(days=1, hours=12), "shipped"),
+    (2, Decimal("120.25"), None, None, None),
+]
+COLUMNS = ["order_id", "price", "created_at", "shipping_time", "status"]
+
+def test_database_types_are_kept():
+    table = results_to_arrow(ROWS, COLUMNS)
+
+    logger.info(f"Arrow schema: {table.schema}")
+
+    assert pa.types.is_integer(table.schema.field("order_id").type)
+    assert table.schema.field("price").type == pa.decimal128(5, 2)
+    assert pa.types.is_timestamp(table.schema.field("created_at").type)
+    assert pa.types.is_duration(table.schema.field("shipping_time").type)
+    assert table.column("price").to_pylist() == [Decimal("9.50"), Decimal("120.25")]
+    assert table.column("shipping_time").to_pylist() == [timedelta(days=1, hours=12), None]
+
+def test_untyped_values_fall_back_to_strings():
+    value = uuid.UUID(int=1)
+    table = results_to_arrow([(None,), (value,)], ["token"])
+
+    mixed = results_to_arrow([(1,), ("a",)], ["code"])
+
+    assert table.schema.field("token").type == pa.string()
+    assert table.column("token").to_pylist() == [None, str(value)]
+    assert mixed.column("code").to_pylist() == ["1", "a"]
+
+def test_ipc_stream_round_trip():
+    payload = encode_results(ROWS, COLUMNS, "arrow", {"sql_query": "SELECT * FROM orders"})
+    table = pa.ipc.open_stream(payload).read_all()
+
+    assert table.column_names == COLUMNS
+    assert table.num_rows == 2
+    assert table.schema.metadata[b"sql_query"] == b"SELECT * FROM orders"
+
+def test_parquet_round_trip_and_empty_result():
+    table = pq.read_table(pa.BufferReader(encode_results(ROWS, COLUMNS, "parquet")))
+    empty = pa.ipc.open_stream(encode_results([], COLUMNS, "arrow")).read_all()
+
+    assert table.column("created_at").to_pylist() == [datetime(2024, 3, 1, 12, 30), None]
+    assert table.column("price").to_pylist() == [Decimal("9.50"), Decimal("120.25")]
+    assert empty.column_names == COLUMNS and empty.num_rows == 0
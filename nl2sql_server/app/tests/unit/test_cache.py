@@ -0,0 +1,151 @@
+import pytest
+import logging
+from utils import cache as cache_module
+from utils.cache import (
+    MemoryTier, get_cache, set_cache, delete_cache_key, cache_stats, tag_cache_key, invalidate_tables,
+    get_swr_cache, set_swr_cache, get_swr_bytes_cache, set_swr_bytes_cache,
+)
+
+logger = logging.getLogger(__name__)
+
+pytestmark = [
+    pytest.mark.usefixtures("isolated_cache"),
+    pytest.mark.parametrize("isolated_cache", [{"max_entries": 3, "max_bytes": 1024}], indirect=True),
+]
+
+def test_set_writes_through_to_both_tiers(isolated_cache):
+    logger.info("\n\n--- Test Started: Write Through ---")
+
+    set_cache("k1", {"sql": "SELECT 1"})
+
+    assert isolated_cache.get("k1") == b'{"sql":"SELECT 1"}'
+    assert get_cache("k1") == {"sql": "SELECT 1"}
+    stats = cache_stats()
+    assert stats["memory"]["hits"] == 1
+    assert stats["disk"]["hits"] == 0
+
+    logger.info("--- Test Ended: Write Through ---\n\n")
+
+def test_disk_hit_is_promoted_to_memory(isolated_cache):
+    logger.info("\n\n--- Test Started: Promotion ---")
+
+    isolated_cache.set("k1", '{"rows": [1, 2]}', expire=60)
+
+    assert get_cache("k1") == {"rows": [1, 2]}
+    assert get_cache("k1") == {"rows": [1, 2]}
+
+    stats = cache_stats()
+    assert stats["disk"]["hits"] == 1
+    assert stats["memory"]["hits"] == 1
+    assert stats["memory"]["misses"] == 1
+
+    logger.info("--- Test Ended: Promotion ---\n\n")
+
+def test_miss_and_delete(isolated_cache):
+    assert get_cache("missing") is None
+    set_cache("k1", {"a": 1})
+    delete_cache_key("k1")
+
+    assert get_cache("k1") is None
+    assert cache_stats()["disk"]["misses"] == 2
+
+def test_memory_tier_evicts_by_entries_and_bytes():
+    logger.info("\n\n--- Test Started: LRU Eviction ---")
+
+    tier = MemoryTier(max_entries=2, max_bytes=100)
+    tier.set("a", 1, size=10)
+    tier.set("b", 2, size=10)
+    tier.get("a")  # "b" is now least recently used
+    tier.set("c", 3, size=10)
+
+    assert tier.get("b") is None
+    assert tier.get("a") == 1
+    assert tier.stats()["evictions"] == 1
+
+    tier.set("big", 4, size=95)
+    assert tier.get("a") is None and tier.get("c") is None
+    assert tier.get("big") == 4
+    assert tier.stats()["bytes"] == 95
+
+    # Entries larger than the whole tier are never kept in memory
+    tier.set("huge", 5, size=500)
+    assert tier.get("huge") is None
+
+    logger.info("--- Test Ended: LRU Eviction ---\n\n")
+
+def test_memory_tier_respects_expiry():
+    tier = MemoryTier(max_entries=10, max_bytes=1000)
+    tier.set("old", 1, size=1, expire_at=0.0)
+
+    assert tier.get("old") is None
+    assert tier.stats()["entries"] == 0
+
+def test_invalidate_tables_drops_exactly_the_tagged_keys(isolated_cache):
+    logger.info("\n\n--- Test Started: Table Invalidation ---")
+
+    set_cache("users_q", {"json": [1]})
+    set_cache("orders_q", {"json": [2]})
+    set_cache("join_q", {"json": [3]})
+    tag_cache_key("users_q", {"users"})
+    tag_cache_key("orders_q", {"orders"})
+    tag_cache_key("join_q", {"users", "orders"})
+
+    assert invalidate_tables({"users"}) == 2
+
+    assert get_cache("users_q") is None
+    assert get_cache("join_q") is None
+    assert get_cache("orders_q") == {"json": [2]}
+
+    # The users index is consumed, a second write has nothing left to invalidate
+    assert invalidate_tables({"users"}) == 0
+
+    logger.info("--- Test Ended: Table Invalidation ---\n\n")
+
+def test_tag_cache_key_prunes_expired_keys(isolated_cache):
+    set_cache("gone", {"json": []})
+    tag_cache_key("gone", {"users"})
+    delete_cache_key("gone")
+
+    set_cache("live", {"json": []})
+    tag_cache_key("live", {"users"})
+
+    assert isolated_cache.get("table-index:users") == ["live"]
+
+def test_swr_entry_turns_stale_after_soft_ttl(isolated_cache, monkeypatch):
+    logger.info("\n\n--- Test Started: Stale While Revalidate ---")
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+
+    set_swr_cache("q", {"json": [1]}, fresh_for=10, expire=100)
+    assert get_swr_cache("q") == ({"json": [1]}, False)
+
+    now[0] += 11
+    assert get_swr_cache("q") == ({"json": [1]}, True)
+
+    assert get_swr_cache("missing") == (None, False)
+
+    logger.info("--- Test Ended: Stale While Revalidate ---\n\n")
+
+def test_plain_entry_under_swr_key_is_a_miss():
+    # Result entries cached as plain {"table", "json"} dicts before stale-while-revalidate
+    set_cache("q", {"table": "", "json": [1]})
+
+    assert get_swr_cache("q") == (None, False)
+
+def test_bytes_entries_skip_json_and_are_invalidated(isolated_cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+
+    set_swr_bytes_cache("export", b"\xff\x00arrow", fresh_for=10, expire=100)
+    tag_cache_key("export", {"orders"})
+
+    assert isolated_cache.get("export")[0] == b"\xff\x00arrow"
+    assert get_swr_bytes_cache("export") == (b"\xff\x00arrow", False)
+
+    cache_module.memory_cache.clear()
+    now[0] += 11
+    assert get_swr_bytes_cache("export") == (b"\xff\x00arrow", True)
+
+    assert invalidate_tables({"orders"}) == 1
+    assert get_swr_bytes_cache("export") == (None, False)
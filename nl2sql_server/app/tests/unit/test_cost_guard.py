@@ -0,0 +1,119 @@
+import pytest
+import logging
+from unittest.mock import MagicMock
+from core.config import settings
+from services.cost_guard import check_query_cost, summarize_plan
+
+logger = logging.getLogger(__name__)
+
+CARTESIAN_PLAN = [{"Plan": {
+    "Node Type": "Nested Loop", "Total Cost": 52_000_000.0, "Plan Rows": 400_000_000,
+    "Plans": [
+        {"Node Type": "Seq Scan", "Relation Name": "order_items", "Total Cost": 2000.0, "Plan Rows": 20000},
+        {"Node Type": "Materialize", "Total Cost": 900.0, "Plan Rows": 20000, "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "reviews", "Total Cost": 800.0, "Plan Rows": 20000},
+        ]},
+    ],
+}}]
+LIMITED_PLAN = [{"Plan": {"Node Type": "Limit", "Total Cost": 130.0, "Plan Rows": 1000}}]
+AGGREGATE_PLAN = [{"Plan": {"Node Type": "Aggregate", "Total Cost": 53_000_000.0, "Plan Rows": 1}}]
+CHEAP_PLAN = [{"Plan": {"Node Type": "Index Scan", "Relation Name": "users", "Total Cost": 8.3, "Plan Rows": 1}}]
+
+pytestmark = pytest.mark.usefixtures("isolated_cache")
+
+def postgres_db(plans):
+    """A session whose EXPLAIN returns plans[sql fragment] for the first fragment found in the SQL."""
+    db = MagicMock()
+    db.bind.dialect.name = "postgresql"
+
+    def execute(statement, params):
+        sql = str(statement)
+        for fragment, plan in plans.items():
+            if fragment in sql:
+                return MagicMock(scalar=MagicMock(return_value=plan))
+        raise AssertionError(f"unexpected EXPLAIN: {sql}")
+
+    db.execute.side_effect = execute
+    return db
+
+def test_summarize_plan():
+    summary = summarize_plan(CARTESIAN_PLAN)
+
+    assert summary == {
+        "total_cost": 52_000_000.0,
+        "plan_rows": 400_000_000,
+        "node_type": "Nested Loop",
+        "seq_scans": ["order_items", "reviews"],
+    }
+
+def test_cheap_query_is_allowed_and_cached():
+    logger.info("\n\n--- Test Started: Cost Guard Allow ---")
+
+    db = postgres_db({"FROM users": CHEAP_PLAN})
+    sql, plan = check_query_cost(db, "SELECT * FROM users WHERE user_id = :p0;", {"p0": 1})
+    check_query_cost(db, "SELECT * FROM users WHERE user_id = :p0;", {"p0": 1})
+
+    assert sql == "SELECT * FROM users WHERE user_id = :p0"
+    assert plan["action"] == "allowed"
+    assert plan["total_cost"] == 8.3
+    # The repeat was answered from the cache
+    assert db.execute.call_count == 1
+
+    logger.info("--- Test Ended: Cost Guard Allow ---\n\n")
+
+def test_expensive_select_is_downgraded_with_limit():
+    logger.info("\n\n--- Test Started: Cost Guard Limit ---")
+
+    db = postgres_db({"cost_guarded": LIMITED_PLAN, "FROM order_items": CARTESIAN_PLAN})
+    sql, plan = check_query_cost(db, "SELECT * FROM order_items, reviews")
+    logger.info("Downgraded to %s with plan %s", sql, plan)
+
+    assert sql == f"SELECT * FROM (SELECT * FROM order_items, reviews) AS cost_guarded LIMIT {settings.COST_GUARD_LIMIT_ROWS}"
+    assert plan["action"] == "limited"
+    assert plan["original"]["total_cost"] == 52_000_000.0
+
+    logger.info("--- Test Ended: Cost Guard Limit ---\n\n")
+
+def test_limit_downgrade_can_be_refused():
+    db = postgres_db({"cost_guarded": LIMITED_PLAN, "FROM order_items": CARTESIAN_PLAN})
+    check_query_cost(db, "SELECT * FROM order_items, reviews")
+
+    # Streams and exports reject instead of silently truncating, from the cached decision too
+    with pytest.raises(ValueError, match="estimated cost 52000000"):
+        check_query_cost(db, "SELECT * FROM order_items, reviews", allow_limit=False)
+
+@pytest.mark.parametrize("sql", [
+    "DROP TABLE audit_log;",
+    "ALTER TABLE users ADD COLUMN nickname TEXT",
+    "TRUNCATE order_items",
+    "CREATE INDEX idx_orders_user ON orders (user_id)",
+])
+def test_statements_explain_cannot_plan_are_not_checked(sql):
+    db = postgres_db({})
+
+    assert check_query_cost(db, sql) == (sql, None)
+    db.execute.assert_not_called()
+
+@pytest.mark.parametrize("action, plans", [
+    # A LIMIT doesn't make an aggregate over a cartesian join cheaper
+    ("limit", {"cost_guarded": AGGREGATE_PLAN, "FROM order_items": AGGREGATE_PLAN}),
+    ("reject", {"FROM order_items": CARTESIAN_PLAN}),
+])
+def test_expensive_query_is_rejected(monkeypatch, action, plans):
+    monkeypatch.setattr(settings, "COST_GUARD_ACTION", action)
+    db = postgres_db(plans)
+
+    with pytest.raises(ValueError, match="rejected by the cost guard"):
+        check_query_cost(db, "SELECT COUNT(*) FROM order_items, reviews")
+    calls = db.execute.call_count
+    # Rejections are cached too
+    with pytest.raises(ValueError):
+        check_query_cost(db, "SELECT COUNT(*) FROM order_items, reviews")
+    assert db.execute.call_count == calls
+
+def test_other_databases_are_not_checked():
+    db = MagicMock()
+    db.bind.dialect.name = "sqlite"
+
+    assert check_query_cost(db, "SELECT * FROM users;") == ("SELECT * FROM users;", None)
+    db.execute.assert_not_called()
@@ -1,6 +1,7 @@
 import pytest
 import logging
 from utils.formatter import format_results
+from decimal import Decimal
 
 # Create logger
 logger = logging.getLogger(__name__)
@@ -38,3 +39,70 @@ def test_empty_result():
     logger.info(f"Testing empty result: {result}")
 
     assert "No data found" in result['table'] or len(result['json']) == 0
+
+def test_stream_chunks_convert_database_types():
+    from datetime import datetime, timedelta
+    from utils.formatter import ndjson_chunks, csv_chunks
+
+    columns = ["id", "price", "created_at", "duration", "note"]
+    batches = [[(1, Decimal("9.50"), datetime(2024, 3, 1, 12, 30), timedelta(hours=1), None)]]
+
+    ndjson = list(ndjson_chunks({"columns": columns}, columns, iter(batches)))
+    csv_text = "".join(csv_chunks(columns, iter(batches)))
+
+    logger.info(f"NDJSON: {ndjson} CSV: {csv_text}")
+
+    assert ndjson[0] == '{"columns": ["id", "price", "created_at", "duration", "note"]}\n'
+    assert ndjson[1] == (
+        '{"id": 1, "price": 9.5, "created_at": "2024-03-01T12:30:00", "duration": 3600.0, "note": null}\n'
+    )
+    assert csv_text.splitlines() == ["id,price,created_at,duration,note", "1,9.5,2024-03-01T12:30:00,3600.0,"]
+
+def test_columns_convert_by_type_with_nulls():
+    from datetime import datetime, timedelta
+
+    rows = [
+        (1, Decimal("9.5"), datetime(2024, 3, 1, 12, 30), timedelta(days=1, hours=12), True),
+        (None, None, None, None, None),
+    ]
+    columns = ["order_id", "price", "created_at", "shipping_time", "paid"]
+    result = format_results(rows, columns)
+
+    logger.info(f"Testing typed columns: {result['json']}")
+
+    assert result['json'] == [
+        {"order_id": 1, "price": "9.50", "created_at": "2024-03-01 12:30:00", "shipping_time": "1.50", "paid": True},
+        {"order_id": None, "price": None, "created_at": None, "shipping_time": None, "paid": None},
+    ]
+
+def test_id_columns_stay_whole_numbers():
+    rows = [(3, 2.5), (4, 7)]
+    columns = ["customer_id", "score"]
+    result = format_results(rows, columns)
+
+    logger.info(f"Testing id columns: {result['json']}")
+
+    assert result['json'] == [{"customer_id": 3, "score": "2.50"}, {"customer_id": 4, "score": "7.00"}]
+
+def test_only_requested_formats_are_built():
+    rows = [('John', 30)]
+    columns = ['name', 'age']
+
+    json_only = format_results(rows, columns, formats=["json"])
+    table_only = format_results(rows, columns, formats=["table"])
+
+    logger.info(f"Testing formats: {json_only} {table_only}")
+
+    assert json_only == {"json": [{"name": "John", "age": "30.00"}]}
+    assert list(table_only) == ["table"] and "John" in table_only["table"]
+    assert format_results([], columns, formats=["json"]) == {"json": []}
+
+def test_columnar_sends_column_names_once():
+    rows = [('John', 30), ('Jane', None)]
+    columns = ['name', 'age']
+    result = format_results(rows, columns, formats=["columnar"])
+
+    logger.info(f"Testing columnar: {result}")
+
+    assert result == {"columns": ["name", "age"], "data": [["John", "Jane"], ["30.00", None]]}
+    assert format_results([], columns, formats=["columnar"]) == {"columns": ["name", "age"], "data": [[], []]}
@@ -0,0 +1,45 @@
+import pytest
+import logging
+from llm import client as openai_client
+from llm.client import get_openai_client, close_openai_clients
+
+logger = logging.getLogger(__name__)
+
+@pytest.fixture(autouse=True)
+def fresh_openai_client():
+    openai_client._clients.clear()
+    yield
+    openai_client._clients.clear()
+
+@pytest.mark.asyncio
+async def test_client_is_shared_across_calls():
+    logger.info("\n\n--- Test Started: Shared Client ---")
+
+    first = get_openai_client("fake-api-key")
+    second = get_openai_client("fake-api-key")
+    other = get_openai_client("other-api-key")
+
+    assert first is second
+    assert other is not first
+
+    await close_openai_clients()
+
+    assert openai_client._clients == {}
+    assert get_openai_client("fake-api-key") is not first
+
+    logger.info("--- Test Ended: Shared Client ---\n\n")
+
+@pytest.mark.asyncio
+async def test_client_uses_configured_limits(mocker):
+    logger.info("\n\n--- Test Started: Client Limits ---")
+
+    mocker.patch.object(openai_client.settings, "OPENAI_MAX_CONNECTIONS", 7)
+    mocker.patch.object(openai_client.settings, "OPENAI_TIMEOUT", 12.5)
+    limits = mocker.spy(openai_client.httpx, "Limits")
+
+    client = get_openai_client("fake-api-key")
+
+    assert limits.call_args.kwargs["max_connections"] == 7
+    assert client.timeout.read == 12.5
+
+    logger.info("--- Test Ended: Client Limits ---\n\n")
@@ -2,7 +2,7 @@
 
 import pytest
 import logging
-from utils.optimizer import optimize_question
+from utils.optimizer import optimize_question, canonicalize_question
 
 logger = logging.getLogger(__name__)
 
@@ -26,3 +26,82 @@ def test_optimize_question(input_question, expected_output):
     
     assert optimized == expected_output
     logger.info("\n--- Test Ended ---\n\n")
+
+
+@pytest.mark.parametrize("first, second", [
+    ("Top 5 products by revenue", "top 5 products by revenue?"),
+    ("Top 5 products by revenue", "  Top   five products, by revenue!! "),
+    ("show me the average order amount", "What is the average order amount?"),
+    ("orders above 100.00", "orders above 100"),
+    ("rating above .5", "rating above 0.5"),
+    ("orders above 1,000", "orders above 1000"),
+])
+def test_canonicalize_question_merges_rewordings(first, second):
+    assert canonicalize_question(first) == canonicalize_question(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("top 5 products by revenue", "top 10 products by revenue"),
+    ("users who ordered", "users who never ordered"),
+    ("orders from 'John'", "orders from 'john'"),
+    ("rating above 0.5", "rating above 5"),
+    ("orders with total > 100", "orders with total < 100"),
+    ("orders with total >= 100", "orders with total > 100"),
+    ("status != 'paid'", "status = 'paid'"),
+    ("status <> 'paid'", "status = 'paid'"),
+    ("balance below -100", "balance below 100"),
+    ("discount above 1,5", "discount above 15"),
+    ("growth above 5%", "growth above 5"),
+    ("price + tax per order", "price - tax per order"),
+    ("revenue / orders per month", "revenue * orders per month"),
+    ("rating above .5", "rating above 5"),
+])
+def test_canonicalize_question_keeps_meaningful_differences(first, second):
+    assert canonicalize_question(first) != canonicalize_question(second)
+
+
+QUESTION_CORPUS = [
+    "Top 5 products by revenue",
+    "top 5 products by revenue?",
+    "Top five products by revenue",
+    "show me the top 5 products by revenue",
+    "How many users registered today?",
+    "how many users registered today",
+    "How many users  registered today ?",
+    "What is the average order amount?",
+    "average order amount",
+    "Show me the average order amount.",
+    "List all orders above 1,000",
+    "list all orders above 1000",
+    "orders above 1000.00",
+    "Which products are out of stock?",
+    "which products are out of stock",
+    "Top 10 products by revenue",
+    "How many users registered yesterday?",
+]
+
+
+def replay_hit_rate(key_fn):
+    seen = set()
+    hits = 0
+    for question in QUESTION_CORPUS:
+        key = key_fn(optimize_question(question))
+        if key in seen:
+            hits += 1
+        seen.add(key)
+    return hits / len(QUESTION_CORPUS)
+
+
+def test_canonical_cache_key_replay_hit_rate():
+    logger.info("\n\n--- Test Started: Cache Key Replay ---")
+
+    raw_hit_rate = replay_hit_rate(lambda question: question)
+    canonical_hit_rate = replay_hit_rate(canonicalize_question)
+
+    logger.info("Raw key hit rate: %.0f%%, canonical key hit rate: %.0f%%",
+                raw_hit_rate * 100, canonical_hit_rate * 100)
+
+    assert canonical_hit_rate > raw_hit_rate
+    assert canonical_hit_rate >= 0.5
+
+    logger.info("--- Test Ended: Cache Key Replay ---\n\n")
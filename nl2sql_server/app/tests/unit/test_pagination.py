@@ -0,0 +1,121 @@
+import pytest
+import logging
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from core.config import settings
+from services import pagination
+from services.pagination import keyset_columns, first_page, next_page
+
+logger = logging.getLogger(__name__)
+
+TABLES = {
+    "orders": {"columns": [], "primary_key": ["order_id"], "foreign_keys": []},
+    "order_items": {"columns": [], "primary_key": ["order_id", "line_no"], "foreign_keys": []},
+    "audit_log": {"columns": [], "primary_key": [], "foreign_keys": []},
+}
+
+pytestmark = pytest.mark.usefixtures("isolated_cache")
+
+@pytest.fixture(autouse=True)
+def isolated_spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PAGINATION_SPILL_DIR", str(tmp_path / "spill"))
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pages.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE orders (order_id INTEGER PRIMARY KEY, total NUMERIC, status TEXT)"))
+        conn.execute(text("INSERT INTO orders (total, status) VALUES " + ", ".join(
+            f"({i * 10}, '{'paid' if i % 2 else 'open'}')" for i in range(1, 26)
+        )))
+    with sessionmaker(bind=engine)() as session:
+        yield session
+    engine.dispose()
+
+def collect_pages(db, sql, page_size):
+    rows, columns, cursor = first_page(db, sql, None, page_size, TABLES)
+    pages = [rows]
+    while cursor:
+        rows, columns, cursor, _ = next_page(db, cursor)
+        pages.append(rows)
+    return pages, columns
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM orders WHERE status = 'paid'", ["order_id"]),
+    ("SELECT * FROM order_items", ["order_id", "line_no"]),
+    ("SELECT * FROM orders ORDER BY total DESC", None),
+    ("SELECT status, COUNT(*) FROM orders GROUP BY status", None),
+    ("SELECT * FROM orders o JOIN order_items i ON i.order_id = o.order_id", None),
+    ("SELECT * FROM audit_log", None),
+    ("SELECT * FROM orders WHERE status = 'ORDER BY'", ["order_id"]),
+])
+def test_keyset_columns(sql, expected):
+    assert keyset_columns(sql, TABLES) == expected
+
+def test_keyset_pages_continue_after_last_key(db, mocker):
+    logger.info("\n\n--- Test Started: Keyset Pagination ---")
+
+    execute = mocker.spy(pagination, "execute_query")
+    pages, columns = collect_pages(db, "SELECT * FROM orders WHERE total > 0;", 10)
+
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [row[0] for page in pages for row in page] == list(range(1, 26))
+    # Each page asks the database for the rows after the previous page only
+    last_call_sql, last_call_params = execute.call_args.args[1:]
+    logger.info("Last page SQL: %s %s", last_call_sql, last_call_params)
+    assert '"order_id" > :page_key0' in last_call_sql
+    assert last_call_params["page_key0"] == 20
+
+    logger.info("--- Test Ended: Keyset Pagination ---\n\n")
+
+def test_ordered_query_is_spilled_and_read_by_offset(db):
+    logger.info("\n\n--- Test Started: Spilled Pagination ---")
+
+    rows, columns, cursor = first_page(db, "SELECT order_id, total FROM orders ORDER BY total DESC", None, 10, TABLES)
+    assert [row[0] for row in rows] == list(range(25, 15, -1))
+
+    # Later pages come from the spill file, not from the database
+    db.execute(text("DROP TABLE orders"))
+    rows, columns, cursor, state = next_page(db, cursor)
+    assert [row[0] for row in rows] == list(range(15, 5, -1))
+    assert state["mode"] == "spill"
+    rows, columns, cursor, _ = next_page(db, cursor)
+    assert [row[0] for row in rows] == [5, 4, 3, 2, 1]
+    assert cursor is None
+
+    logger.info("--- Test Ended: Spilled Pagination ---\n\n")
+
+def test_spilled_pages_keep_database_types(db, mocker):
+    from datetime import datetime, timedelta
+    from utils.formatter import format_results
+
+    columns = ["order_id", "created_at", "shipping_time"]
+    rows = [(i, datetime(2024, 3, 1, 12, 30), timedelta(days=1, hours=12)) for i in range(1, 16)]
+    mocker.patch.object(pagination, "stream_query", return_value=(columns, iter([rows[:7], rows[7:]])))
+
+    first, _, cursor = first_page(db, "SELECT * FROM shipments ORDER BY order_id", None, 10, TABLES)
+    second, spilled_columns, cursor, _ = next_page(db, cursor)
+
+    # Formatted like keyset pages and unpaginated results, not from JSON-converted values
+    assert first == rows[:10] and second == rows[10:]
+    assert cursor is None
+    assert format_results(second, spilled_columns, ["json"])["json"][0] == {
+        "order_id": 11, "created_at": "2024-03-01 12:30:00", "shipping_time": "1.50"
+    }
+
+def test_falls_back_to_spill_without_key_in_select_list(db):
+    pages, columns = collect_pages(db, "SELECT status FROM orders", 10)
+
+    assert columns == ["status"]
+    assert [len(page) for page in pages] == [10, 10, 5]
+
+def test_single_page_has_no_cursor(db, tmp_path):
+    rows, columns, cursor = first_page(db, "SELECT * FROM orders ORDER BY order_id", None, 50, TABLES)
+
+    assert len(rows) == 25
+    assert cursor is None
+    assert list((tmp_path / "spill").iterdir()) == []
+
+def test_unknown_cursor_is_rejected(db):
+    with pytest.raises(ValueError, match="invalid or has expired"):
+        next_page(db, "not-a-cursor")
@@ -0,0 +1,81 @@
+import pytest
+import logging
+import threading
+import time
+from sqlalchemy import create_engine, exc, text
+from db.schema_extractor.pool_metrics import InstrumentedQueuePool, instrument_engine
+
+logger = logging.getLogger(__name__)
+
+@pytest.fixture
+def pool_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.2,
+    )
+    metrics = instrument_engine(engine, "test")
+    yield engine, metrics
+    engine.dispose()
+
+def test_checkouts_overflow_and_timeouts_are_counted(pool_engine):
+    logger.info("\n\n--- Test Started: Pool Metrics ---")
+
+    engine, metrics = pool_engine
+    first, second = engine.connect(), engine.connect()
+
+    stats = metrics.stats(engine.pool)
+    assert stats["in_use"] == 2
+    assert stats["overflow"] == 1 and stats["peak_overflow"] == 1
+
+    # Both connections are taken and the overflow is used up, so the next checkout times out
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    first.close()
+    second.close()
+    stats = metrics.stats(engine.pool)
+    logger.info("Pool stats: %s", stats)
+
+    assert stats["in_use"] == 0 and stats["peak_in_use"] == 2
+    assert stats["connects"] == 2
+    assert stats["checkouts"] == 2 and stats["checkins"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["checkout_wait_ms"]["count"] == 3
+    assert stats["checkout_wait_ms"]["max"] >= 200
+    assert stats["checkout_wait_ms"]["buckets"]["le_250"] + stats["checkout_wait_ms"]["buckets"]["le_500"] == 1
+
+    logger.info("--- Test Ended: Pool Metrics ---\n\n")
+
+def test_wait_for_a_busy_pool_is_measured(pool_engine):
+    engine, metrics = pool_engine
+    engine.pool._max_overflow = 0
+    engine.pool._timeout = 5
+    held = engine.connect()
+
+    def release():
+        time.sleep(0.1)
+        held.close()
+
+    threading.Thread(target=release).start()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    waits = metrics.stats(engine.pool)["checkout_wait_ms"]
+    assert waits["max"] >= 100
+    assert waits["p99"] in (250, 500)
+    assert metrics.stats(engine.pool)["timeouts"] == 0
+
+def test_invalidation_and_dispose_keep_counting(pool_engine):
+    engine, metrics = pool_engine
+    with engine.connect() as conn:
+        conn.invalidate()
+    assert metrics.stats(engine.pool)["invalidations"] == 1
+
+    engine.dispose()
+    assert engine.pool.metrics is metrics
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert metrics.stats(engine.pool)["checkouts"] == 2
@@ -0,0 +1,70 @@
+import pytest
+import logging
+from llm.prompt_builder import build_prompt, PROMPT_RULES, TREND_EXAMPLE
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "Table users:\n"
+    "  - user_id (INTEGER) PK\n"
+    "  - name (VARCHAR(100))\n"
+    "  - email (VARCHAR(255))\n"
+    "  - phone (VARCHAR(20))\n"
+    "  - address (TEXT)\n"
+    "Table orders:\n"
+    "  - order_id (INTEGER) PK\n"
+    "  - user_id (INTEGER) FK -> users.user_id\n"
+    "  - status (VARCHAR(20))\n"
+    "  - shipping_notes (TEXT)\n"
+)
+
+def test_prompt_within_budget_is_unchanged():
+    logger.info("\n\n--- Test Started: Prompt Within Budget ---")
+
+    prompt, breakdown = build_prompt("List all users", SCHEMA, budget=10000)
+    logger.info("Breakdown: %s", breakdown)
+
+    assert PROMPT_RULES in prompt
+    assert SCHEMA in prompt
+    assert 'Question: "List all users"' in prompt
+    assert breakdown["dropped_columns"] == 0
+    assert breakdown["total"] == (
+        breakdown["rules"] + breakdown["schema"] + breakdown["question"] + breakdown["examples"]
+    )
+
+    logger.info("--- Test Ended: Prompt Within Budget ---\n\n")
+
+def test_examples_dropped_before_schema_columns():
+    logger.info("\n\n--- Test Started: Examples Dropped First ---")
+
+    _, full = build_prompt("Show the rating trend", SCHEMA, budget=10000)
+    budget = full["total"] - 1
+    prompt, breakdown = build_prompt("Show the rating trend", SCHEMA, budget=budget)
+    logger.info("Breakdown: %s", breakdown)
+
+    assert full["examples"] > 0
+    assert TREND_EXAMPLE not in prompt
+    assert breakdown["dropped_examples"] == 1
+    assert breakdown["dropped_columns"] == 0
+    assert SCHEMA in prompt
+
+    logger.info("--- Test Ended: Examples Dropped First ---\n\n")
+
+def test_low_priority_columns_dropped_to_fit_budget():
+    logger.info("\n\n--- Test Started: Columns Dropped ---")
+
+    _, full = build_prompt("Which users have an email?", SCHEMA, budget=10000)
+    prompt, breakdown = build_prompt("Which users have an email?", SCHEMA, budget=full["total"] - 5)
+    logger.info("Breakdown: %s", breakdown)
+
+    assert breakdown["dropped_columns"] > 0
+    assert breakdown["total"] <= breakdown["budget"]
+    # Keys, table headers and columns named in the question survive
+    assert "Table orders:" in prompt
+    assert "order_id (INTEGER) PK" in prompt
+    assert "user_id (INTEGER) FK -> users.user_id" in prompt
+    assert "email (VARCHAR(255))" in prompt
+    # Trimming starts from the last table
+    assert "shipping_notes" not in prompt
+
+    logger.info("--- Test Ended: Columns Dropped ---\n\n")
@@ -2,7 +2,8 @@ import pytest
 import logging
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from db.schema_extractor.schema_extractor import extract_schema
+from unittest.mock import MagicMock
+from db.schema_extractor.schema_extractor import extract_schema, reflect_schema, reflect_schema_bulk, render_schema
 
 logger = logging.getLogger(__name__)
 
@@ -37,3 +38,55 @@ def test_extract_schema_success(db):
     assert "email" in schema_str
     
     logger.info("--- Test Ended: Extract Schema Success ---\n\n")
+
+def test_extract_schema_includes_keys(db):
+    logger.info("\n\n--- Test Started: Extract Schema Keys ---")
+
+    db.execute(text("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)"))
+    db.execute(text("CREATE TABLE invoices (id INTEGER PRIMARY KEY, customer_id INTEGER REFERENCES customers(id))"))
+    db.commit()
+
+    tables = reflect_schema(db, mode="inspector")
+    schema_str = render_schema(tables)
+    logger.info("Extracted Schema: \n%s", schema_str)
+
+    assert tables["invoices"]["primary_key"] == ["id"]
+    assert tables["invoices"]["foreign_keys"] == [
+        {"column": "customer_id", "ref_table": "customers", "ref_column": "id"}
+    ]
+    assert "  - customer_id (INTEGER) FK -> customers.id" in schema_str
+    assert "  - id (INTEGER) PK" in schema_str
+
+    logger.info("--- Test Ended: Extract Schema Keys ---\n\n")
+
+def test_reflect_schema_bulk_builds_tables_from_catalog_rows():
+    logger.info("\n\n--- Test Started: Bulk Reflection ---")
+
+    column_rows = [
+        ("orders", "order_id", "integer", None, 32, 0),
+        ("orders", "user_id", "integer", None, 32, 0),
+        ("orders", "total_amount", "numeric", None, 10, 2),
+        ("users", "user_id", "integer", None, 32, 0),
+        ("users", "email", "character varying", 255, None, None),
+    ]
+    constraint_rows = [
+        ("orders", "FOREIGN KEY", "user_id", "users", "user_id"),
+        ("orders", "PRIMARY KEY", "order_id", None, None),
+        ("users", "PRIMARY KEY", "user_id", None, None),
+    ]
+    fake_db = MagicMock()
+    fake_db.execute.side_effect = [column_rows, constraint_rows]
+
+    tables = reflect_schema_bulk(fake_db)
+    schema_str = render_schema(tables)
+    logger.info("Bulk Schema: \n%s", schema_str)
+
+    # One round-trip for columns, one for keys, regardless of table count
+    assert fake_db.execute.call_count == 2
+    assert list(tables) == ["orders", "users"]
+    assert "  - order_id (INTEGER) PK" in schema_str
+    assert "  - user_id (INTEGER) FK -> users.user_id" in schema_str
+    assert "  - total_amount (NUMERIC(10, 2))" in schema_str
+    assert "  - email (CHARACTER VARYING(255))" in schema_str
+
+    logger.info("--- Test Ended: Bulk Reflection ---\n\n")
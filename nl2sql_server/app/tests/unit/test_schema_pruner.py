@@ -0,0 +1,90 @@
+import pytest
+import logging
+from collections import OrderedDict
+from db.schema_extractor.schema_extractor import render_schema
+from llm.schema_pruner import select_relevant_tables, prune_schema, build_schema_context
+
+logger = logging.getLogger(__name__)
+
+def make_table(columns, primary_key, foreign_keys=()):
+    return {
+        "columns": [{"name": name, "type": "INTEGER"} for name in columns],
+        "primary_key": [primary_key],
+        "foreign_keys": [
+            {"column": column, "ref_table": ref_table, "ref_column": column}
+            for column, ref_table in foreign_keys
+        ],
+    }
+
+@pytest.fixture
+def ecommerce_tables():
+    return OrderedDict([
+        ("users", make_table(["user_id", "name", "email", "created_at"], "user_id")),
+        ("categories", make_table(["category_id", "name"], "category_id")),
+        ("products", make_table(["product_id", "name", "price", "category_id"], "product_id",
+                                [("category_id", "categories")])),
+        ("orders", make_table(["order_id", "user_id", "total_amount", "created_at"], "order_id",
+                              [("user_id", "users")])),
+        ("order_items", make_table(["order_item_id", "order_id", "product_id", "quantity"], "order_item_id",
+                                   [("order_id", "orders"), ("product_id", "products")])),
+        ("reviews", make_table(["review_id", "user_id", "product_id", "rating"], "review_id",
+                               [("user_id", "users"), ("product_id", "products")])),
+        ("inventory_transactions", make_table(["transaction_id", "product_id", "change_qty"], "transaction_id",
+                                              [("product_id", "products")])),
+    ])
+
+def test_orders_question_expands_along_foreign_keys(ecommerce_tables):
+    logger.info("\n\n--- Test Started: FK Expansion ---")
+
+    selected = select_relevant_tables("How many orders were placed last month?", ecommerce_tables)
+    logger.info("Selected tables: %s", selected)
+
+    # orders -> order_items (references orders) -> products (referenced by order_items)
+    assert "orders" in selected
+    assert "order_items" in selected
+    assert "products" in selected
+    assert "users" in selected
+    assert "reviews" not in selected
+    assert "inventory_transactions" not in selected
+
+    logger.info("--- Test Ended: FK Expansion ---\n\n")
+
+def test_synonyms_map_to_schema_vocabulary(ecommerce_tables):
+    logger.info("\n\n--- Test Started: Synonyms ---")
+
+    selected = select_relevant_tables("Which customers gave the best rating?", ecommerce_tables)
+    logger.info("Selected tables: %s", selected)
+
+    assert "users" in selected
+    assert "reviews" in selected
+
+    logger.info("--- Test Ended: Synonyms ---\n\n")
+
+def test_unmatched_question_keeps_full_schema(ecommerce_tables):
+    logger.info("\n\n--- Test Started: No Match ---")
+
+    pruned = prune_schema("What is the weather like?", ecommerce_tables)
+
+    assert list(pruned) == list(ecommerce_tables)
+
+    logger.info("--- Test Ended: No Match ---\n\n")
+
+def test_build_schema_context_reports_token_savings(ecommerce_tables):
+    logger.info("\n\n--- Test Started: Token Savings ---")
+
+    full_schema = render_schema(ecommerce_tables)
+    context, usage = build_schema_context("List users and their emails", ecommerce_tables, full_schema)
+    logger.info("Schema usage: %s", usage)
+
+    assert "Table users:" in context
+    assert "Table inventory_transactions:" not in context
+    assert usage["schema_tokens_sent"] < usage["schema_tokens_full"]
+    assert usage["schema_tokens_saved"] == usage["schema_tokens_full"] - usage["schema_tokens_sent"]
+
+    logger.info("--- Test Ended: Token Savings ---\n\n")
+
+def test_build_schema_context_without_tables_sends_full_schema():
+    context, usage = build_schema_context("List users", None, "Table users:\n  - id (INTEGER)\n")
+
+    assert context == "Table users:\n  - id (INTEGER)\n"
+    assert usage["schema_tokens_saved"] == 0
@@ -0,0 +1,75 @@
+import pytest
+import logging
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from db.schema_extractor.schema_extractor import reflect_schema
+from db.schema_extractor.schema_snapshot import SchemaSnapshot, schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+@pytest.fixture(scope="function")
+def db():
+    # Fresh in-memory database per test so fingerprints don't leak between tests
+    engine = create_engine("sqlite:///:memory:")
+    with sessionmaker(bind=engine)() as session:
+        session.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)"))
+        session.commit()
+        yield session
+
+def test_snapshot_reused_while_fingerprint_unchanged(db):
+    logger.info("\n\n--- Test Started: Snapshot Reuse ---")
+
+    snapshot = SchemaSnapshot(check_interval=0)
+    first = snapshot.get(db)
+    second = snapshot.get(db)
+
+    assert first == second
+    assert "Table users:" in first
+    assert snapshot.rebuild_count == 1
+    assert snapshot.age is not None and snapshot.age >= 0
+
+    logger.info("--- Test Ended: Snapshot Reuse ---\n\n")
+
+def test_snapshot_rebuilt_after_ddl(db):
+    logger.info("\n\n--- Test Started: Snapshot Rebuild On DDL ---")
+
+    snapshot = SchemaSnapshot(check_interval=0)
+    before = snapshot.get(db)
+    fingerprint_before = snapshot.fingerprint
+
+    db.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY, user_id INTEGER)"))
+    db.commit()
+
+    after = snapshot.get(db)
+
+    assert "Table orders:" not in before
+    assert "Table orders:" in after
+    assert snapshot.fingerprint != fingerprint_before
+    assert snapshot.rebuild_count == 2
+
+    logger.info("--- Test Ended: Snapshot Rebuild On DDL ---\n\n")
+
+def test_fingerprint_not_checked_within_interval(db, mocker):
+    logger.info("\n\n--- Test Started: Fingerprint Check Interval ---")
+
+    reflector = mocker.Mock(side_effect=reflect_schema)
+    snapshot = SchemaSnapshot(reflector=reflector, check_interval=3600)
+    fingerprint_spy = mocker.patch(
+        "db.schema_extractor.schema_snapshot.schema_fingerprint",
+        side_effect=schema_fingerprint,
+    )
+
+    snapshot.get(db)
+    db.execute(text("CREATE TABLE orders (id INTEGER PRIMARY KEY)"))
+    db.commit()
+    cached = snapshot.get(db)
+
+    assert fingerprint_spy.call_count == 1
+    assert reflector.call_count == 1
+    assert "Table orders:" not in cached
+
+    snapshot.invalidate()
+    assert "Table orders:" in snapshot.get(db)
+    assert snapshot.stats()["rebuild_count"] == 2
+
+    logger.info("--- Test Ended: Fingerprint Check Interval ---\n\n")
@@ -0,0 +1,95 @@
+import pytest
+import logging
+from utils.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
+@pytest.fixture
+def semantic_cache():
+    return SemanticCache(directory=None, threshold=0.8)
+
+def test_rewording_hits_cached_sql(semantic_cache):
+    logger.info("\n\n--- Test Started: Near-Duplicate Hit ---")
+
+    semantic_cache.add("how many users signed up?", "SELECT COUNT(*) FROM users;", "fp1")
+    match = semantic_cache.lookup("count of users who registered", "fp1")
+    logger.info("Match: %s", match)
+
+    assert match is not None
+    assert match["sql"] == "SELECT COUNT(*) FROM users;"
+    assert match["similarity"] >= 0.8
+
+    logger.info("--- Test Ended: Near-Duplicate Hit ---\n\n")
+
+@pytest.mark.parametrize("stored, asked", [
+    ("top 5 products by revenue", "top 10 products by revenue"),
+    ("users who placed orders", "users who never placed orders"),
+    ("orders from 'John'", "orders from 'Jane'"),
+    ("top 5 products by revenue per month", "top 5 products by revenue per month excluding returns"),
+    ("how many users signed up", "average rating of products"),
+    ("top 5 products by revenue per month for premium users in 2023",
+     "bottom 5 products by revenue per month for premium users in 2023"),
+    ("orders with total > 100 grouped by month", "orders with total < 100 grouped by month"),
+    ("users with balance below -100", "users with balance below 100"),
+    ("products with the most reviews", "products with the least reviews"),
+    ("products with highest rating per category", "products with lowest rating per category"),
+    ("orders above 100 per user", "orders below 100 per user"),
+    ("users with more than 5 orders", "users with fewer than 5 orders"),
+    ("products sorted by price asc", "products sorted by price desc"),
+    ("show total revenue per month by customers in Germany for 2023",
+     "show total revenue per month by customers in France for 2023"),
+    ("average order amount per user for orders shipped with express delivery in the electronics category",
+     "total order amount per user for orders shipped with express delivery in the electronics category"),
+    ("minimum order amount per user for orders shipped with express delivery in the electronics category",
+     "maximum order amount per user for orders shipped with express delivery in the electronics category"),
+    ("revenue per product in march", "revenue per product in april"),
+    ("orders placed on monday by premium users", "orders placed on friday by premium users"),
+    ("revenue per category last week", "revenue per category this week"),
+])
+def test_different_queries_do_not_match(semantic_cache, stored, asked):
+    semantic_cache.add(stored, "SELECT 1;", "fp1")
+
+    assert semantic_cache.lookup(asked, "fp1") is None
+
+def test_schema_fingerprint_must_match(semantic_cache):
+    semantic_cache.add("how many users signed up", "SELECT COUNT(*) FROM users;", "fp1")
+
+    assert semantic_cache.lookup("how many users signed up", "fp2") is None
+    assert semantic_cache.lookup("how many users signed up", None) is None
+
+def test_index_persists_across_restarts(tmp_path):
+    logger.info("\n\n--- Test Started: Persistence ---")
+
+    directory = str(tmp_path / "semantic")
+    first = SemanticCache(directory=directory)
+    first.add("how many users signed up?", "SELECT COUNT(*) FROM users;", "fp1")
+    first.add("how many users signed up", "SELECT COUNT(user_id) FROM users;", "fp1")
+
+    restarted = SemanticCache(directory=directory)
+    match = restarted.lookup("number of customers who registered", "fp1")
+
+    # The exact repeat replaced the first answer instead of adding a second entry
+    assert restarted.stats()["entries"] == 1
+    assert match["sql"] == "SELECT COUNT(user_id) FROM users;"
+
+    logger.info("--- Test Ended: Persistence ---\n\n")
+
+def test_load_reads_the_index_before_any_lookup(tmp_path):
+    directory = str(tmp_path / "semantic")
+    SemanticCache(directory=directory).add("how many users signed up", "SELECT COUNT(*) FROM users;", "fp1")
+
+    restarted = SemanticCache(directory=directory)
+    assert restarted.stats()["entries"] == 0
+    restarted.load()
+
+    assert restarted.stats()["entries"] == 1
+
+def test_oldest_entries_evicted_beyond_capacity():
+    cache = SemanticCache(directory=None, max_entries=2)
+    cache.add("total revenue by month", "SELECT 1;", "fp1")
+    cache.add("average rating per product", "SELECT 2;", "fp1")
+    cache.add("orders per coupon", "SELECT 3;", "fp1")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("total revenue by month", "fp1") is None
+    assert cache.lookup("orders per coupon", "fp1")["sql"] == "SELECT 3;"
@@ -1,7 +1,14 @@
 import pytest
+import asyncio
 import logging
-from sqlalchemy import text
-from db.schema_extractor.session import get_db
+import threading
+import time
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from core.config import settings
+from db.schema_extractor.session import get_db, run_db, ReplicaRouter
+from db.sql_executor.sql_executor import StatementCanceller, execute_query, prepare_connection
 
 logger = logging.getLogger(__name__)
 
@@ -18,3 +25,137 @@ def test_get_db_session_works():
         logger.info("DB session executed a test query successfully.")
 
     logger.info("--- Test Ended: DB Session Works ---\n\n")
+
+@pytest.mark.asyncio
+async def test_run_db_keeps_event_loop_free():
+    logger.info("\n\n--- Test Started: run_db Offload ---")
+
+    def blocking_query():
+        time.sleep(0.3)
+        return threading.current_thread().name
+
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticking = asyncio.create_task(ticker())
+    thread_name = await run_db(blocking_query)
+    ticking.cancel()
+    logger.info("Ran in %s, loop ticked %d times", thread_name, ticks)
+
+    assert thread_name.startswith("db")
+    # The loop kept running other work while the query blocked its thread
+    assert ticks >= 10
+
+    logger.info("--- Test Ended: run_db Offload ---\n\n")
+
+@pytest.mark.asyncio
+async def test_cancelling_run_db_interrupts_running_statement(tmp_path):
+    logger.info("\n\n--- Test Started: run_db Cancellation ---")
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    finished = threading.Event()
+    outcome = {}
+
+    def slow_query():
+        try:
+            with Session(engine) as db:
+                execute_query(db, (
+                    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 500000000) "
+                    "SELECT COUNT(*) FROM c"
+                ))
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            finished.set()
+
+    task = asyncio.create_task(run_db(slow_query))
+    await asyncio.sleep(0.3)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # The statement stops right away instead of running to completion
+    assert await asyncio.to_thread(finished.wait, 5)
+    logger.info("Statement ended with: %s", outcome.get("error"))
+    assert "interrupted" in str(outcome["error"])
+    engine.dispose()
+
+    logger.info("--- Test Ended: run_db Cancellation ---\n\n")
+
+def test_cancelled_canceller_refuses_new_statements():
+    canceller = StatementCanceller()
+    canceller.cancel()
+
+    with pytest.raises(RuntimeError):
+        canceller.attach(MagicMock())
+
+def test_statement_timeout_is_set_locally_on_postgres(monkeypatch):
+    monkeypatch.setattr(settings, "STATEMENT_TIMEOUT_MS", 1500)
+    db = MagicMock(spec=Session)
+    db.connection.return_value.dialect.name = "postgresql"
+
+    prepare_connection(db)
+
+    statement, params = db.execute.call_args.args
+    assert "set_config('statement_timeout', :timeout, true)" in str(statement)
+    assert params == {"timeout": "1500ms"}
+
+def named_engine(tmp_path, name):
+    replica = create_engine(f"sqlite:///{tmp_path / name}.db")
+    with replica.begin() as conn:
+        conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+        conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": name})
+    return replica
+
+def whoami(engine):
+    with Session(engine) as db:
+        return db.execute(text("SELECT name FROM whoami")).scalar()
+
+def test_replica_router_round_robin(tmp_path):
+    logger.info("\n\n--- Test Started: Replica Round Robin ---")
+
+    primary = named_engine(tmp_path, "primary")
+    router = ReplicaRouter(primary, [named_engine(tmp_path, "r1"), named_engine(tmp_path, "r2")])
+
+    reads = [whoami(router.pick(read_only=True)) for _ in range(4)]
+    writes = [whoami(router.pick(read_only=False)) for _ in range(2)]
+    logger.info("Reads went to %s, writes to %s", reads, writes)
+
+    assert reads == ["r1", "r2", "r1", "r2"]
+    assert writes == ["primary", "primary"]
+    assert router.stats()["routed"] == {"primary": 2, "replica": 4, "fallback": 0}
+
+    logger.info("--- Test Ended: Replica Round Robin ---\n\n")
+
+def test_replica_router_least_connections(tmp_path):
+    busy, idle = named_engine(tmp_path, "busy"), named_engine(tmp_path, "idle")
+    router = ReplicaRouter(named_engine(tmp_path, "primary"), [busy, idle], strategy="least_connections")
+
+    with busy.connect():
+        assert router.pick(read_only=True) is idle
+
+def test_unhealthy_replicas_are_skipped_then_fall_back_to_primary(tmp_path):
+    logger.info("\n\n--- Test Started: Replica Health ---")
+
+    healthy = named_engine(tmp_path, "healthy")
+    broken = create_engine(f"sqlite:///{tmp_path / 'missing' / 'broken.db'}")
+    primary = named_engine(tmp_path, "primary")
+    router = ReplicaRouter(primary, [broken, healthy])
+
+    router.check_health()
+    assert [whoami(router.pick(read_only=True)) for _ in range(3)] == ["healthy"] * 3
+
+    router.mark_down(healthy)
+    assert router.pick(read_only=True) is primary
+    assert router.stats()["routed"]["fallback"] == 1
+
+    # A later health check brings the replica back
+    router.check_health()
+    assert router.pick(read_only=True) is healthy
+
+    logger.info("--- Test Ended: Replica Health ---\n\n")
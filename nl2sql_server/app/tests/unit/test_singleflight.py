@@ -0,0 +1,75 @@
+import pytest
+import asyncio
+import logging
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    logger.info("\n\n--- Test Started: Coalesce Concurrent Calls ---")
+
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"sql": "SELECT 1"}
+
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(10)])
+
+    assert calls == 1
+    assert all(result == {"sql": "SELECT 1"} for result in results)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 9}
+
+    # Once the call has finished the next caller starts fresh work
+    await flight.do("key", work)
+    assert calls == 2
+
+    logger.info("--- Test Ended: Coalesce Concurrent Calls ---\n\n")
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*[flight.do("key", work) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_work_survives_until_last_waiter_cancels():
+    logger.info("\n\n--- Test Started: Cancellation ---")
+
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flight.do("key", work))
+    second = asyncio.create_task(flight.do("key", work))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+
+    logger.info("--- Test Ended: Cancellation ---\n\n")
@@ -2,7 +2,7 @@ import pytest
 import logging
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from db.sql_executor.sql_executor import execute_query
+from db.sql_executor.sql_executor import execute_query, stream_query
 
 logger = logging.getLogger(__name__)
 
@@ -62,3 +62,32 @@ def test_execute_invalid_sql(db):
     logger.info("Test Passed: Execute Invalid SQL. Exception raised as expected.")
     
     logger.info("--- Test Ended: Execute Invalid SQL ---\n\n")
+
+def test_stream_query_yields_batches(db):
+    logger.info("\n\n--- Test Started: Stream Query ---")
+
+    db.execute(text("DROP TABLE IF EXISTS numbers"))
+    db.execute(text("CREATE TABLE numbers (n INTEGER)"))
+    db.execute(text("INSERT INTO numbers (n) VALUES " + ", ".join(f"({i})" for i in range(25))))
+    db.commit()
+
+    columns, batches = stream_query(db, "SELECT n FROM numbers WHERE n >= :low ORDER BY n", {"low": 3}, batch_size=10)
+    batch_sizes = []
+    values = []
+    for batch in batches:
+        batch_sizes.append(len(batch))
+        values.extend(row[0] for row in batch)
+
+    assert columns == ["n"]
+    assert batch_sizes == [10, 10, 2]
+    assert values == list(range(3, 25))
+
+    logger.info("--- Test Ended: Stream Query ---\n\n")
+
+def test_stream_query_without_rows(db):
+    setup_dummy_table(db)
+
+    columns, batches = stream_query(db, "UPDATE test SET name = 'Carol' WHERE id = 1")
+
+    assert columns == []
+    assert list(batches) == []
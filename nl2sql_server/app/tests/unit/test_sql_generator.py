@@ -1,6 +1,14 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from llm.sql_generator import generate_sql
+from llm import client as openai_client
+
+@pytest.fixture(autouse=True)
+def fresh_openai_client():
+    # The client is shared per process; start each test without one so patches apply
+    openai_client._clients.clear()
+    yield
+    openai_client._clients.clear()
 
 @pytest.mark.asyncio
 async def test_generate_sql_success():
@@ -0,0 +1,25 @@
+import pytest
+import logging
+from services.sql_tables import extract_tables
+
+logger = logging.getLogger(__name__)
+
+@pytest.mark.parametrize("sql_query, expected_tables", [
+    ("SELECT * FROM users", {"users"}),
+    ("SELECT u.name FROM users u JOIN orders o ON o.user_id = u.user_id", {"users", "orders"}),
+    ("SELECT * FROM public.orders, order_items oi, products AS p", {"orders", "order_items", "products"}),
+    ("WITH m AS (SELECT product_id FROM reviews) SELECT * FROM m JOIN products USING (product_id)",
+     {"reviews", "products"}),
+    ("SELECT * FROM (SELECT * FROM users) AS sub", {"users"}),
+    ("SELECT EXTRACT(MONTH FROM created_at) FROM orders", {"orders"}),
+    ("SELECT name FROM users WHERE note = 'FROM coupons'", {"users"}),
+    ("UPDATE users SET name='Jane' WHERE id IN (SELECT user_id FROM orders)", {"users", "orders"}),
+    ("INSERT INTO users (name) VALUES ('John')", {"users"}),
+    ("DELETE FROM reviews WHERE id=1", {"reviews"}),
+    ("DROP TABLE IF EXISTS coupons", {"coupons"}),
+    ("TRUNCATE payments", {"payments"}),
+])
+def test_extract_tables(sql_query, expected_tables):
+    logger.info(f"Testing query: {sql_query}")
+
+    assert extract_tables(sql_query) == expected_tables
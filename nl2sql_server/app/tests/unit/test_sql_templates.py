@@ -0,0 +1,114 @@
+import pytest
+import logging
+from sqlalchemy import create_engine, text
+from utils.optimizer import canonicalize_question
+from services.sql_templates import build_template, learn_template, match_template
+from db.sql_executor.sql_executor import execute_query
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.usefixtures("isolated_cache")
+
+def learn(question, sql, fingerprint="fp1"):
+    return learn_template(canonicalize_question(question), sql, fingerprint)
+
+def match(question, fingerprint="fp1"):
+    return match_template(canonicalize_question(question), fingerprint)
+
+def test_literal_is_replaced_by_bound_param():
+    logger.info("\n\n--- Test Started: Build Template ---")
+
+    template = build_template(
+        canonicalize_question("orders for user 42"),
+        "SELECT * FROM orders WHERE user_id = 42;"
+    )
+    logger.info("Template: %s", template)
+
+    assert template["sql"] == "SELECT * FROM orders WHERE user_id = :p0;"
+    assert template["slots"][0]["param"] == "p0"
+    assert template["fixed"] == []
+
+    logger.info("--- Test Ended: Build Template ---\n\n")
+
+@pytest.mark.parametrize("learned, asked, sql, expected_params", [
+    ("orders for user 42", "orders for user 7",
+     "SELECT * FROM orders WHERE user_id = 42", {"p0": 7}),
+    ("top five products by price", "top 20 products by price",
+     "SELECT name FROM products ORDER BY price DESC LIMIT 5", {"p0": 20}),
+    ("revenue in March", "revenue in november",
+     "SELECT SUM(total) FROM orders WHERE EXTRACT(MONTH FROM created_at) = 3", {"p0": 11}),
+    ("orders from user 'John'", "orders from user 'Jane'",
+     "SELECT * FROM orders o JOIN users u ON u.id = o.user_id WHERE u.name ILIKE '%john%'", {"p0": "%jane%"}),
+])
+def test_matching_shape_binds_new_literals(learned, asked, sql, expected_params):
+    assert learn(learned, sql)
+
+    template_sql, params = match(asked)
+
+    assert ":p0" in template_sql
+    assert params == expected_params
+
+def test_operator_and_sign_are_part_of_the_shape():
+    assert learn("orders with total > 100", "SELECT * FROM orders WHERE total_amount > 100")
+
+    assert match("orders with total > 50")[1] == {"p0": 50}
+    assert match("orders with total < 50") is None
+    assert match("orders with total > -50") is None
+
+    # The minus stays in the SQL, the bound value is the magnitude
+    assert learn("users with balance below -100", "SELECT * FROM users WHERE balance < -100")
+    template_sql, params = match("users with balance below -5")
+    assert template_sql == "SELECT * FROM users WHERE balance < -:p0"
+    assert params == {"p0": 5}
+    assert match("users with balance below 5") is None
+
+def test_unaligned_literal_stays_fixed():
+    logger.info("\n\n--- Test Started: Fixed Literal ---")
+
+    # 2023 only appears inside date strings, so it can't be swapped; 10 can
+    assert learn(
+        "top 10 users by spend in 2023",
+        "SELECT user_id FROM orders WHERE created_at BETWEEN '2023-01-01' AND '2023-12-31' "
+        "GROUP BY user_id ORDER BY SUM(total) DESC LIMIT 10"
+    )
+
+    assert match("top 3 users by spend in 2023")[1] == {"p0": 3}
+    assert match("top 3 users by spend in 2024") is None
+
+    logger.info("--- Test Ended: Fixed Literal ---\n\n")
+
+def test_ambiguous_literal_is_not_parameterized():
+    # Both 5s match both SQL literals, so neither can be assigned a slot
+    assert not learn(
+        "top 5 products rated 5",
+        "SELECT * FROM products WHERE rating = 5 LIMIT 5"
+    )
+
+@pytest.mark.parametrize("asked, fingerprint", [
+    ("orders for user 7", "fp2"),
+    ("orders for user 2.5", "fp1"),
+    ("orders for customer 7", "fp1"),
+    ("orders for user", "fp1"),
+])
+def test_no_match(asked, fingerprint):
+    learn("orders for user 42", "SELECT * FROM orders WHERE user_id = 42")
+
+    assert match(asked, fingerprint) is None
+
+def test_template_executes_with_bound_params():
+    logger.info("\n\n--- Test Started: Execute Template ---")
+
+    engine = create_engine("sqlite:///:memory:")
+    with engine.connect() as db:
+        db.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)"))
+        db.execute(text("INSERT INTO users (name) VALUES ('John'), ('O''Brien')"))
+
+        learn("users named \"John\"", "SELECT id FROM users WHERE name = 'John'")
+        # The new literal is bound, never spliced into the SQL text
+        template_sql, params = match("users named \"O'Brien\"")
+        rows, _ = execute_query(db, template_sql, params)
+
+    assert params == {"p0": "O'Brien"}
+    assert [row[0] for row in rows] == [2]
+
+    logger.info("--- Test Ended: Execute Template ---\n\n")
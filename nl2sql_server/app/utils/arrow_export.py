@@ -0,0 +1,52 @@
+# utils/arrow_export.py
+import uuid
+import pyarrow as pa
+import pyarrow.parquet as pq
+from core.config import settings
+
+EXPORT_FORMATS = ("arrow", "parquet")
+
+def _as_strings(values):
+    return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+
+def _column_array(values):
+    """
+    Arrow array for one column of database values, keeping their types.
+    - Decimal -> decimal128/256, datetime -> timestamp, timedelta (intervals) -> duration,
+      date/time -> date32/time64
+    - Decimal precision and scale are inferred from the values in this result (the widest
+      ones seen), not taken from the column's declared NUMERIC(p, s)
+    - UUIDs and values Arrow can't type (mixed types) are exported as strings; newer pyarrow
+      would otherwise infer UUIDs as an arrow.uuid extension type many readers don't know
+    """
+    first = next((value for value in values if value is not None), None)
+    if isinstance(first, uuid.UUID):
+        return _as_strings(values)
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return _as_strings(values)
+
+def results_to_arrow(rows, columns) -> pa.Table:
+    columns = list(columns)
+    if not rows:
+        return pa.Table.from_arrays([pa.array([], type=pa.null()) for _ in columns], names=columns)
+    return pa.Table.from_arrays([_column_array(list(values)) for values in zip(*rows)], names=columns)
+
+def encode_results(rows, columns, format: str, metadata: dict = None) -> bytes:
+    """
+    Encode query rows as an Arrow IPC stream ("arrow") or a Parquet file ("parquet").
+    - IPC record batches hold at most STREAM_BATCH_SIZE rows
+    - `metadata` (e.g. the SQL) is stored as string key/values in the schema
+    """
+    table = results_to_arrow(rows, columns)
+    if metadata:
+        table = table.replace_schema_metadata({key: str(value) for key, value in metadata.items()})
+
+    sink = pa.BufferOutputStream()
+    if format == "parquet":
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=settings.STREAM_BATCH_SIZE)
+    return sink.getvalue().to_pybytes()
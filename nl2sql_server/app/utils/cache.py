@@ -1,21 +1,185 @@
 # utils/cache.py
 import hashlib
-import json
+import threading
+import time
+from collections import OrderedDict
+import orjson
 from diskcache import Cache
+from core.config import settings
 
-cache = Cache(".nl2sql_cache")  
+cache = Cache(".nl2sql_cache")
+
+
+class MemoryTier:
+    """
+    In-process LRU of already-deserialized values.
+    - Bounded by entry count and by serialized size in bytes
+    - Values are shared between callers and must not be mutated
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value, size: int, expire_at: float = None):
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[key] = (value, size, expire_at)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+memory_cache = MemoryTier(settings.CACHE_MEMORY_MAX_ENTRIES, settings.CACHE_MEMORY_MAX_BYTES)
+disk_stats = {"hits": 0, "misses": 0}
+
+TABLE_INDEX_PREFIX = "table-index:"
+
+def _memory_expire_at(expire_at: float = None):
+    # Other worker processes can't reach this tier on invalidation, so bound how long it may lag disk
+    cap = time.time() + settings.CACHE_MEMORY_TTL
+    return cap if expire_at is None else min(expire_at, cap)
+
+def _dumps(value) -> bytes:
+    # Unlike json.dumps, orjson encodes dates and UUIDs as well, and is much faster
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
 
 def make_hash_key(value: str) -> str:
     return hashlib.md5(value.encode()).hexdigest()
 
 def get_cache(key: str):
-    return cache.get(key)
+    value = memory_cache.get(key)
+    if value is not None:
+        return value
+
+    payload, expire_at = cache.get(key, expire_time=True)
+    if payload is None:
+        disk_stats["misses"] += 1
+        return None
+
+    # Promote disk hits so the next lookup skips SQLite and decoding
+    disk_stats["hits"] += 1
+    value = orjson.loads(payload)
+    memory_cache.set(key, value, len(payload), _memory_expire_at(expire_at))
+    return value
 
 def set_cache(key: str, value: dict, expire: int = 600):
-    cache.set(key, json.dumps(value), expire=expire)
+    payload = _dumps(value)
+    cache.set(key, payload, expire=expire)
+    expire_at = time.time() + expire if expire else None
+    memory_cache.set(key, orjson.loads(payload), len(payload), _memory_expire_at(expire_at))
+
+def get_swr_bytes_cache(key: str):
+    """
+    Return (payload, is_stale) for binary results stored with set_swr_bytes_cache,
+    or (None, False) on a miss. Payloads are returned as-is, without decoding.
+    """
+    entry = memory_cache.get(key)
+    if entry is None:
+        entry, expire_at = cache.get(key, expire_time=True)
+        if not isinstance(entry, tuple):
+            disk_stats["misses"] += 1
+            return None, False
+        disk_stats["hits"] += 1
+        memory_cache.set(key, entry, len(entry[0]), _memory_expire_at(expire_at))
+    payload, fresh_until = entry
+    return payload, time.time() >= fresh_until
+
+def set_swr_bytes_cache(key: str, payload: bytes, fresh_for: int, expire: int):
+    """Cache binary results (Arrow IPC, Parquet) without a JSON round-trip, stale after `fresh_for` seconds."""
+    entry = (payload, time.time() + fresh_for)
+    cache.set(key, entry, expire=expire)
+    memory_cache.set(key, entry, len(payload), _memory_expire_at(time.time() + expire))
+
+def set_swr_cache(key: str, value, fresh_for: int, expire: int):
+    """Cache `value` for `expire` seconds, reporting it as stale once `fresh_for` seconds pass."""
+    set_cache(key, {"value": value, "fresh_until": time.time() + fresh_for}, expire=expire)
+
+def get_swr_cache(key: str):
+    """Return (value, is_stale), or (None, False) on a miss."""
+    entry = get_cache(key)
+    # Entries written by set_cache directly (e.g. results cached before this format) are misses
+    if not isinstance(entry, dict) or "value" not in entry or "fresh_until" not in entry:
+        return None, False
+    return entry["value"], time.time() >= entry["fresh_until"]
 
 def delete_cache_key(key: str):
+    memory_cache.delete(key)
     cache.delete(key)
 
+def tag_cache_key(key: str, tables):
+    """Record that `key` was computed from `tables`, so writes to them can invalidate it."""
+    with cache.transact():
+        for table in tables:
+            index_key = TABLE_INDEX_PREFIX + table
+            # Drop keys that already expired so the index doesn't grow forever
+            keys = [k for k in cache.get(index_key, []) if k != key and k in cache]
+            keys.append(key)
+            cache.set(index_key, keys)
+
+def invalidate_tables(tables) -> int:
+    invalidated = set()
+    with cache.transact():
+        for table in tables:
+            for key in cache.pop(TABLE_INDEX_PREFIX + table, []):
+                cache.delete(key)
+                invalidated.add(key)
+    for key in invalidated:
+        memory_cache.delete(key)
+    return len(invalidated)
+
 def clear_cache():
+    memory_cache.clear()
     cache.clear()
+
+def cache_stats() -> dict:
+    return {
+        "memory": memory_cache.stats(),
+        "disk": {**disk_stats, "entries": len(cache), "bytes": cache.volume()},
+    }
@@ -1,32 +1,131 @@
+import csv
+import io
+import json
 import pandas as pd
 from tabulate import tabulate
 import numpy as np
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
-def format_results(rows, columns):
-    if not rows:
-        return {"table": "No results returned", "json": []}
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-    df = pd.DataFrame(rows, columns=columns)
+OUTPUT_FORMATS = ("json", "table")
 
-    for col in df.columns:
-        if df[col].apply(lambda x: isinstance(x, Decimal)).any():
-            df[col] = df[col].apply(lambda x: float(x) if pd.notnull(x) else x)
+def _column_kind(values) -> str:
+    """Kind of a result column, from its first non-null value (database columns hold one type)."""
+    first = next((value for value in values if value is not None), None)
+    if isinstance(first, bool):
+        return "other"
+    if isinstance(first, (int, float, np.number)):
+        return "number"
+    if isinstance(first, Decimal):
+        return "decimal"
+    if isinstance(first, datetime):
+        return "datetime"
+    if isinstance(first, timedelta):
+        return "timedelta"
+    return "other"
 
-    for col in df.select_dtypes(include=['datetime']).columns:
-        df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+def _to_numbers(values, kind: str):
+    """int64 or float64 array for a column of numbers, with NaN for nulls."""
+    if kind == "number":
+        numbers = np.array(values)
+        if numbers.dtype.kind in "iuf":
+            return numbers
+    return np.fromiter((np.nan if value is None else value for value in values), dtype=float, count=len(values))
 
-    for col in df.columns:
-        if df[col].apply(lambda x: isinstance(x, pd.Timedelta)).any():
-            df[col] = df[col].apply(lambda x: x.total_seconds() / 86400 if pd.notnull(x) else x)
+def _format_numbers(name: str, numbers):
+    nulls = np.isnan(numbers) if numbers.dtype.kind == "f" else None
+    if 'id' in name.lower():
+        # Identifiers are shown as whole numbers
+        if nulls is not None:
+            numbers = np.trunc(np.where(nulls, 0, numbers)).astype(np.int64)
+        converted = numbers.tolist()
+    else:
+        converted = list(map('%.2f'.__mod__, numbers.tolist()))
+    if nulls is not None and nulls.any():
+        for position in np.flatnonzero(nulls).tolist():
+            converted[position] = None
+    return converted
 
-    for col in df.select_dtypes(include=[np.number]).columns:
-        if 'id' not in col.lower():  
-            df[col] = df[col].apply(lambda x: f"{x:.2f}" if pd.notnull(x) else x)
-        else:
-            df[col] = df[col].apply(lambda x: int(x) if pd.notnull(x) else x)
+def convert_column(name: str, values) -> list:
+    """
+    Convert one column of database values for display, the whole column at once.
+    - Decimal and numbers become "%.2f" strings, or ints in columns named like an id
+    - Intervals become days, then are formatted like numbers
+    - Timestamps become "YYYY-MM-DD HH:MM:SS" strings
+    - Nulls stay None, other values are passed through
+    """
+    kind = _column_kind(values)
+    if kind in ("number", "decimal"):
+        return _format_numbers(name, _to_numbers(values, kind))
+    if kind == "timedelta":
+        days = pd.to_timedelta(pd.Series(values, dtype=object)).dt.total_seconds().to_numpy() / 86400
+        return _format_numbers(name, days)
+    if kind == "datetime":
+        series = pd.Series(values)
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.dt.strftime(DATETIME_FORMAT).astype(object).where(series.notna(), None).tolist()
+    return list(values)
 
-    table = tabulate(df, headers='keys', tablefmt='psql', showindex=False)
-    json_result = df.to_dict(orient='records')
+def convert_columns(rows, columns) -> list:
+    """Converted values of each column, in column order."""
+    return [convert_column(name, values) for name, values in zip(columns, zip(*rows))]
 
-    return {"table": table, "json": json_result}
+def format_results(rows, columns, formats=OUTPUT_FORMATS):
+    """
+    Format query rows for the response, only in the requested `formats`.
+    - "json": {"json": [{column: value}, ...]}
+    - "table": {"table": psql-style text table}, the costly one on large results
+    - "columnar": {"columns": [column, ...], "data": [[values of a column], ...]}, column names sent once
+    """
+    columns = list(columns)
+    converted_columns = convert_columns(rows, columns) if rows else [[] for _ in columns]
+
+    formatted = {}
+    if "columnar" in formats:
+        formatted["columns"] = columns
+        formatted["data"] = converted_columns
+    if "table" in formats or "json" in formats:
+        converted_rows = list(zip(*converted_columns))
+        if "table" in formats:
+            formatted["table"] = (
+                tabulate(converted_rows, headers=columns, tablefmt='psql') if rows else "No results returned"
+            )
+        if "json" in formats:
+            formatted["json"] = [dict(zip(columns, row)) for row in converted_rows]
+    return formatted
+
+def to_json_value(value):
+    """Plain JSON value for a database value (Decimal, dates and intervals included)."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return str(value)
+
+def ndjson_chunks(header: dict, columns, batches):
+    """Yield the header frame, then one JSON object per row, one chunk per batch."""
+    yield json.dumps(header) + "\n"
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, map(to_json_value, row)))) + "\n" for row in batch
+        )
+
+def csv_chunks(columns, batches):
+    """Yield the CSV header row, then one chunk of CSV lines per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            ["" if value is None else to_json_value(value) for value in row] for row in batch
+        )
+        yield buffer.getvalue()
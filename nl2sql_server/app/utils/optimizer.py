@@ -1,4 +1,6 @@
 # utils/optimizer.py
+import re
+import unicodedata
 
 def optimize_question(question: str) -> str:
     """
@@ -26,3 +28,75 @@ def optimize_question(question: str) -> str:
         question += "?"
 
     return question
+
+
+NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+    "eleven": "11", "twelve": "12", "fifteen": "15", "twenty": "20",
+    "thirty": "30", "fifty": "50", "hundred": "100",
+}
+
+# Filler words that never change which SQL answers the question
+STOPWORDS = {
+    "a", "an", "the", "please", "kindly", "me", "us", "i", "we", "you",
+    "can", "could", "would", "will", "want", "need", "like",
+    "show", "list", "display", "give", "get", "find", "tell", "fetch",
+    "what", "is", "are", "was", "were",
+}
+
+QUOTED_LITERAL = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+# Symbols that change the answer, kept as words so "total > 100" and "total < 100" differ
+SYMBOL_WORDS = {
+    "<=": "lte", ">=": "gte", "!=": "neq", "<>": "neq", "<": "lt", ">": "gt", "=": "eq", "%": "pct",
+    "+": "plus", "-": "minus", "*": "times", "/": "divided",
+}
+
+# Numbers with thousands separators ("1,000" but not "1,5"), plain numbers, bare fractions (".5")
+NUMBER = r"\d{1,3}(?:,\d{3})+(?!\d)(?:\.\d+)?|\d+(?:\.\d+)?|(?<![\w.])\.\d+"
+# Quoted literal placeholders, negative numbers (not the dash in 2023-01), numbers,
+# comparison symbols, a free-standing minus and the other arithmetic symbols, words
+QUESTION_TOKEN = re.compile(
+    rf"\x00|(?<![\w.-])-(?:{NUMBER})|{NUMBER}|<=|>=|!=|<>|(?<!\S)-(?!\S)|[<>=%+*/]|\w+"
+)
+
+
+def _canonical_number(token: str) -> str:
+    whole, _, fraction = token.replace(",", "").partition(".")
+    whole = whole.lstrip("0") or "0"
+    fraction = fraction.rstrip("0")
+    return f"{whole}.{fraction}" if fraction else whole
+
+
+def canonicalize_question(question: str) -> str:
+    """
+    Normalize a question into a cache key (the model still gets the original text).
+    - Unicode and case folding, punctuation and whitespace collapsed
+    - Number words and number formats unified ("five", "5.0", "5" -> "5")
+    - Comparison and arithmetic symbols, a leading minus and % kept as words
+      ("> -5%" -> "gt neg 5 pct", "price + tax" -> "price plus tax")
+    - Filler words dropped, quoted literals kept verbatim
+    """
+    question = unicodedata.normalize("NFKC", question)
+    literals = QUOTED_LITERAL.findall(question)
+    question = QUOTED_LITERAL.sub(" \x00 ", question).casefold()
+
+    tokens = []
+    literal_index = 0
+    for token in QUESTION_TOKEN.findall(question):
+        if token == "\x00":
+            tokens.append(literals[literal_index])
+            literal_index += 1
+        elif token in SYMBOL_WORDS:
+            tokens.append(SYMBOL_WORDS[token])
+        elif token[0] == "-":
+            tokens.extend(["neg", _canonical_number(token[1:])])
+        elif token[0].isdigit() or token[0] == ".":
+            tokens.append(_canonical_number(token))
+        elif token in NUMBER_WORDS:
+            tokens.append(NUMBER_WORDS[token])
+        elif token not in STOPWORDS:
+            tokens.append(token)
+
+    return " ".join(tokens)
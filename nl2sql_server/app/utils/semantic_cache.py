@@ -0,0 +1,230 @@
+# utils/semantic_cache.py
+import re
+import threading
+import zlib
+import numpy as np
+from diskcache import Index
+from loguru import logger
+from core.config import settings
+from utils.optimizer import canonicalize_question
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+MERSENNE_PRIME = (1 << 31) - 1
+
+_rng = np.random.default_rng(20240501)
+PERM_A = _rng.integers(1, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+
+# Phrasings of the same intent, applied to the canonical question before tokenizing
+CONCEPT_PHRASES = [
+    (r"\bhow many\b", "count"),
+    (r"\bnumber of\b", "count"),
+    (r"\bsigned up\b|\bsign ups?\b|\bsignups?\b|\bjoined\b|\bregistrations?\b", "register"),
+    (r"\bcustomers?\b|\bclients?\b|\bbuyers?\b", "user"),
+    (r"\bpurchases?\b|\bpurchased\b|\bbought\b", "order"),
+    (r"\bsales\b|\brevenue\b|\bearnings\b", "revenue"),
+    (r"\bmost expensive\b|\bhighest priced\b", "expensive"),
+]
+
+IGNORED_TOKENS = {"of", "who", "that", "which", "have", "has", "had", "do", "does", "did", "there", "been", "be"}
+
+# Concept words produced by CONCEPT_PHRASES: the only words allowed to differ in form between matching questions
+CONCEPT_WORDS = {concept for _, concept in CONCEPT_PHRASES}
+
+# Words that must match exactly. Any other word outside CONCEPT_WORDS must match too, these
+# are listed because they decide the SQL even where a concept covers them ("count").
+# A near-duplicate with a different number, negation, direction ("top"/"bottom", "> 100"/"< 100"),
+# aggregate, filter value or date range is a different query.
+NEGATIONS = {"not", "no", "never", "without", "none", "except", "exclude", "excluding", "excluded", "excludes"}
+DIRECTIONS = {
+    "top", "bottom", "most", "least", "highest", "lowest", "above", "below", "over", "under",
+    "more", "less", "fewer", "greater", "asc", "ascending", "desc", "descending",
+    # Comparison and arithmetic symbols and a leading minus, as spelled by canonicalize_question
+    "lt", "gt", "lte", "gte", "eq", "neq", "neg", "plus", "minus", "times", "divided",
+}
+AGGREGATES = {
+    "average", "avg", "mean", "median", "sum", "total", "min", "minimum", "max", "maximum",
+    "count", "distinct", "unique",
+}
+CALENDAR_WORDS = {
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "today", "yesterday", "tomorrow", "day", "week", "month", "quarter", "year",
+    "daily", "weekly", "monthly", "quarterly", "yearly", "annual",
+    "last", "next", "this", "previous", "current", "ago", "since", "ytd",
+}
+EXACT_WORDS = NEGATIONS | DIRECTIONS | AGGREGATES | CALENDAR_WORDS
+
+
+def _stem(token: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[: -len(suffix)]
+    return token
+
+
+def _is_exact(word: str, stem: str) -> bool:
+    return word in EXACT_WORDS or stem not in CONCEPT_WORDS
+
+
+def question_features(question: str):
+    """
+    Return (shingles, exact_terms) for a question.
+    - exact_terms: numbers and quoted literals in order, then every word that isn't a
+      CONCEPT_PHRASES concept or ignored, so only rewordings within a concept can match
+    """
+    text = canonicalize_question(question)
+    for pattern, concept in CONCEPT_PHRASES:
+        text = re.sub(pattern, concept, text)
+
+    words = [t for t in re.findall(r"'[^']*'|\"[^\"]*\"|[\w.]+", text) if t not in IGNORED_TOKENS]
+    literals = tuple(t for t in words if t[0] in "'\"" or t[0].isdigit())
+    tokens = [_stem(t) for t in words]
+    exact_words = {
+        stem for word, stem in zip(words, tokens)
+        if word[0] not in "'\"" and not word[0].isdigit() and _is_exact(word, stem)
+    }
+    exact_terms = literals + tuple(sorted(exact_words))
+    shingles = set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+    return frozenset(shingles), exact_terms
+
+
+def minhash(shingles) -> np.ndarray:
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    if not len(hashes):
+        return np.zeros(NUM_PERM, dtype=np.uint64)
+    return ((np.outer(hashes, PERM_A) + PERM_B) % MERSENNE_PRIME).min(axis=0)
+
+
+def _band_keys(signature: np.ndarray):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+
+def _jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class SemanticCache:
+    """
+    Offline near-duplicate index of answered questions (MinHash + LSH over word shingles).
+    - Candidates come from LSH buckets and are verified with exact Jaccard similarity
+    - A hit needs the same schema fingerprint and the same exact terms (see question_features)
+    - Entries persist in a diskcache Index when `directory` is set
+    """
+
+    def __init__(self, directory: str = None, threshold: float = 0.8, max_entries: int = 100000):
+        self.directory = directory
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._index = None
+        self._entries = {}
+        self._buckets = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Load the persisted index now instead of on the first lookup (slow for large indexes)."""
+        with self._lock:
+            self._ensure_loaded()
+
+    def _ensure_loaded(self):
+        if self._index is not None or self.directory is None:
+            return
+        self._index = Index(self.directory)
+        for entry_id, entry in self._index.items():
+            entry["signature"] = np.frombuffer(entry["signature"], dtype=np.uint64)
+            self._insert(entry_id, entry)
+            self._next_id = max(self._next_id, entry_id + 1)
+        logger.info(f"Loaded {len(self._entries)} entries into the semantic cache.")
+
+    def _insert(self, entry_id: int, entry: dict):
+        self._entries[entry_id] = entry
+        for band_key in _band_keys(entry["signature"]):
+            self._buckets.setdefault(band_key, set()).add(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for band_key in _band_keys(entry["signature"]):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band_key]
+        if self._index is not None:
+            self._index.pop(entry_id, None)
+
+    def _best_match(self, shingles, exact_terms, signature, fingerprint):
+        candidates = set()
+        for band_key in _band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+
+        best_id, best_score = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry["fingerprint"] != fingerprint or entry["exact_terms"] != exact_terms:
+                continue
+            score = _jaccard(shingles, entry["shingles"])
+            if score > best_score:
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+
+    def lookup(self, question: str, fingerprint: str):
+        """Return {"question", "sql", "similarity"} for the closest stored question, or None."""
+        if fingerprint is None:
+            return None
+        shingles, exact_terms = question_features(question)
+        signature = minhash(shingles)
+
+        with self._lock:
+            self._ensure_loaded()
+            best_id, best_score = self._best_match(shingles, exact_terms, signature, fingerprint)
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries[best_id]
+            return {"question": entry["question"], "sql": entry["sql"], "similarity": best_score}
+
+    def add(self, question: str, sql: str, fingerprint: str):
+        if fingerprint is None:
+            return
+        shingles, exact_terms = question_features(question)
+        signature = minhash(shingles)
+        entry = {
+            "question": question,
+            "sql": sql,
+            "fingerprint": fingerprint,
+            "shingles": shingles,
+            "exact_terms": exact_terms,
+            "signature": signature,
+        }
+
+        with self._lock:
+            self._ensure_loaded()
+            duplicate_id, score = self._best_match(shingles, exact_terms, signature, fingerprint)
+            if duplicate_id is not None and score == 1.0:
+                self._remove(duplicate_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._insert(entry_id, entry)
+            if self._index is not None:
+                self._index[entry_id] = {**entry, "signature": signature.tobytes()}
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+semantic_cache = SemanticCache(
+    directory=settings.SEMANTIC_CACHE_DIR,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+)
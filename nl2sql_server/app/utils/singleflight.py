@@ -0,0 +1,48 @@
+# utils/singleflight.py
+import asyncio
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+    - The first caller starts the work as a task, later callers await the same task
+    - The task is only cancelled once every caller waiting on it has gone away
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        call = self._calls.get(key)
+        if call is None:
+            call = {"task": asyncio.ensure_future(fn()), "waiters": 0}
+            self._calls[key] = call
+            call["task"].add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        finally:
+            call["waiters"] -= 1
+            if call["waiters"] == 0 and not call["task"].done():
+                call["task"].cancel()
+
+    def _forget(self, key: str, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+llm_flight = SingleFlight("llm")
+result_flight = SingleFlight("result")
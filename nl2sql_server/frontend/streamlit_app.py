@@ -116,7 +116,8 @@ with st.spinner("Generating SQL query and fetching results..."):
 
                 payload = {
                     "question": question,
-                    "allow_modifications": allow_modifications
+                    "allow_modifications": allow_modifications,
+                    "formats": ["columnar"]  # Rendered as a dataframe, column names come once
                 }
 
                 response = requests.post(api_url, json=payload, headers=headers)
@@ -141,7 +142,11 @@ with st.spinner("Generating SQL query and fetching results..."):
 
                     st.write(f"### 📊 Query Results:")
 
-                    if "results" in data:
+                    if data.get("data") is not None:
+                        df = pd.DataFrame(list(zip(*data["data"])), columns=data["columns"])
+                        df.index = df.index + 1
+                        st.dataframe(df, use_container_width=True)
+                    elif data.get("results") is not None:
                         table_data = data["results"]
                         if isinstance(table_data, list):
                             df = pd.DataFrame(table_data)
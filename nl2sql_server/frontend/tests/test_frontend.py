@@ -10,7 +10,8 @@ def mock_requests_post(url, json, headers):
     if url == "http://localhost:8000/v1/query":
         return MockResponse({
             "sql_query": "SELECT * FROM users WHERE age > 30;",
-            "results": [{"id": 1, "name": "John Doe", "age": 35}]
+            "columns": ["id", "name", "age"],
+            "data": [[1], ["John Doe"], [35]]
         })
     return MockResponse(None)
 